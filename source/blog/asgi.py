@@ -0,0 +1,19 @@
+"""
+ASGI config for blog project.
+
+It exposes the ASGI callable as a module-level variable named ``application``,
+to be served by any ASGI 3 server, e.g. ``uvicorn blog.asgi:application``.
+Django 2.2 has no ASGI support of its own; see webapp/asgi.py.
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blog.settings')
+
+wsgi_application = get_wsgi_application()
+
+from webapp.asgi import AsgiHandler  # noqa: E402
+
+application = AsgiHandler(wsgi_application)
@@ -0,0 +1,19 @@
+"""
+Settings are split by environment; BLOG_ENV selects which one is loaded:
+
+    BLOG_ENV=dev   (default) - blog/settings/dev.py
+    BLOG_ENV=prod            - blog/settings/prod.py
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+BLOG_ENV = os.environ.get('BLOG_ENV', 'dev')
+
+if BLOG_ENV == 'dev':
+    from .dev import *  # noqa: F401,F403
+elif BLOG_ENV == 'prod':
+    from .prod import *  # noqa: F401,F403
+else:
+    raise ImproperlyConfigured('Unknown BLOG_ENV %r, expected "dev" or "prod"' % BLOG_ENV)
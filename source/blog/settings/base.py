@@ -0,0 +1,243 @@
+"""
+Django settings for blog project shared by every environment.
+Environment-specific overrides live in dev.py and prod.py, see __init__.py.
+
+Generated by 'django-admin startproject' using Django 2.2.
+
+For more information on this file, see
+https://docs.djangoproject.com/en/2.2/topics/settings/
+
+For the full list of settings and their values, see
+https://docs.djangoproject.com/en/2.2/ref/settings/
+"""
+
+import os
+import tempfile
+
+# Build paths inside the project like this: os.path.join(BASE_DIR, ...)
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+# SECURITY WARNING: don't run with debug turned on in production!
+DEBUG = False
+
+ALLOWED_HOSTS = []
+
+
+# Application definition
+
+INSTALLED_APPS = [
+    'django.contrib.admin',
+    'django.contrib.auth',
+    'django.contrib.contenttypes',
+    'django.contrib.sessions',
+    'django.contrib.messages',
+    'django.contrib.staticfiles',
+    'widget_tweaks',
+    'webapp',
+    'accounts'
+]
+
+MIDDLEWARE = [
+    'webapp.middleware.RequestMetricsMiddleware',
+    'django.middleware.security.SecurityMiddleware',
+    'django.contrib.sessions.middleware.SessionMiddleware',
+    'django.middleware.common.CommonMiddleware',
+    'django.middleware.csrf.CsrfViewMiddleware',
+    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'django.contrib.messages.middleware.MessageMiddleware',
+    'django.middleware.clickjacking.XFrameOptionsMiddleware',
+]
+
+ROOT_URLCONF = 'blog.urls'
+
+TEMPLATES = [
+    {
+        'BACKEND': 'webapp.template_backends.DjangoTemplates',
+        'DIRS': [],
+        'APP_DIRS': True,
+        'OPTIONS': {
+            'context_processors': [
+                'django.template.context_processors.debug',
+                'django.template.context_processors.request',
+                'django.contrib.auth.context_processors.auth',
+                'django.contrib.messages.context_processors.messages',
+            ],
+        },
+    },
+]
+
+WSGI_APPLICATION = 'blog.wsgi.application'
+
+
+# Database
+# https://docs.djangoproject.com/en/2.2/ref/settings/#databases
+
+DATABASES = {
+    'default': {
+        # sqlite3 с BEGIN IMMEDIATE, см. webapp/backends/sqlite3/base.py.
+        'ENGINE': 'webapp.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'OPTIONS': {
+            # Сколько секунд писатель ждёт блокировку, прежде чем получить "database is locked".
+            'timeout': 5,
+        },
+        # Тестовая база в файле: у общей in-memory базы блокировки на уровне таблиц и без ожидания,
+        # так что конкурентные тесты проверяли бы не то, что работает в проде.
+        # pid в имени: параллельные прогоны на одной машине не удаляют базы друг друга.
+        'TEST': {
+            'NAME': os.path.join(tempfile.gettempdir(), 'blog_test_%d.sqlite3' % os.getpid()),
+        },
+    }
+}
+
+# PRAGMA, которые выполняются на каждом новом соединении с SQLite (webapp.signals).
+# WAL позволяет читать во время записи.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+}
+
+# Повторы записи при "database is locked" (webapp.db.write_atomic): число попыток и начальная пауза в секундах.
+SQLITE_WRITE_RETRIES = 5
+SQLITE_WRITE_RETRY_DELAY = 0.05
+
+
+# Password validation
+# https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
+
+AUTH_PASSWORD_VALIDATORS = [
+    {
+        'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.MinimumLengthValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.CommonPasswordValidator',
+    },
+    {
+        'NAME': 'django.contrib.auth.password_validation.NumericPasswordValidator',
+    },
+]
+
+
+# Internationalization
+# https://docs.djangoproject.com/en/2.2/topics/i18n/
+
+LANGUAGE_CODE = 'en-us'
+
+TIME_ZONE = 'Asia/Bishkek'
+
+USE_I18N = True
+
+USE_L10N = True
+
+USE_TZ = True
+
+
+# Static files (CSS, JavaScript, Images)
+# https://docs.djangoproject.com/en/2.2/howto/static-files/
+
+STATIC_URL = '/static/'
+
+
+# Cache
+# https://docs.djangoproject.com/en/2.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'blog',
+    }
+}
+
+# Время жизни закешированных строк списка статей (секунды).
+ARTICLE_ROW_CACHE_TIMEOUT = 60 * 60
+
+# Время жизни закешированных страниц для анонимных посетителей (секунды).
+PAGE_CACHE_TIMEOUT = 60 * 5
+
+# Кеш результатов поиска в памяти процесса (webapp.search_cache): сколько запросов хранить
+# и сколько секунд живёт запись. GET-ответы поиска разрешено кешировать прокси на SEARCH_MAX_AGE секунд.
+SEARCH_CACHE_SIZE = 1000
+SEARCH_CACHE_TIMEOUT = 60 * 5
+SEARCH_MAX_AGE = 60
+
+# Облако тегов в base.html: сколько тегов показывать и сколько секунд хранить отрендеренный фрагмент
+# (сигналы сбрасывают его при любом изменении тегов статей).
+TAG_CLOUD_SIZE = 30
+TAG_CLOUD_CACHE_TIMEOUT = 60 * 60
+
+# Похожие статьи на странице статьи (webapp.related): сколько хранить на статью
+# и по сколько строк за раз перемножать разреженную матрицу статьи × теги.
+RELATED_ARTICLES_COUNT = 5
+RELATED_ARTICLES_BATCH_SIZE = 500
+
+
+# Pagination
+
+# Курсорная пагинация (-created_at, -id) на главной вместо OFFSET.
+INDEX_KEYSET_PAGINATION = False
+
+# Сколько секунд кешируется общее количество строк для пагинатора.
+PAGINATOR_COUNT_CACHE_TIMEOUT = 60
+
+
+# Logging
+# https://docs.djangoproject.com/en/2.2/topics/logging/
+
+# Запросы дольше SLOW_QUERY_MS миллисекунд пишутся в лог webapp.slow_queries
+# с вероятностью SLOW_QUERY_SAMPLE_RATE.
+SLOW_QUERY_MS = 100
+SLOW_QUERY_SAMPLE_RATE = 1.0
+
+# Комментарии к статьям пишутся фоновым потоком пачками (webapp.comment_queue).
+# Пачка закрывается по размеру или через COMMENT_QUEUE_INTERVAL секунд; при переполнении
+# очереди комментарий пишется сразу в запросе. Не записанный комментарий возвращается
+# в очередь не больше COMMENT_QUEUE_RETRIES раз, потом попадает в лог как потерянный.
+COMMENT_QUEUE = False
+COMMENT_QUEUE_BATCH_SIZE = 100
+COMMENT_QUEUE_INTERVAL = 0.2
+COMMENT_QUEUE_MAX_SIZE = 10000
+COMMENT_QUEUE_RETRIES = 3
+
+# Просмотры статей копятся в памяти (webapp.view_counter) и записываются одной транзакцией
+# раз в VIEW_COUNTER_FLUSH_INTERVAL секунд или после VIEW_COUNTER_FLUSH_HITS просмотров.
+VIEW_COUNTER_FLUSH_INTERVAL = 10
+VIEW_COUNTER_FLUSH_HITS = 1000
+
+# Размер пула потоков, в котором blog/asgi.py выполняет представления (webapp.asgi).
+ASGI_THREADS = 8
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {
+            'class': 'logging.StreamHandler',
+        },
+    },
+    'loggers': {
+        'webapp.requests': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'webapp.slow_queries': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+        'webapp.comment_queue': {
+            'handlers': ['console'],
+            'level': 'INFO',
+            'propagate': False,
+        },
+        'webapp.related': {
+            'handlers': ['console'],
+            'level': 'WARNING',
+            'propagate': False,
+        },
+    },
+}
@@ -0,0 +1,19 @@
+"""
+Development settings: debug mode, in-process cache, per-request template loading.
+"""
+
+import copy
+
+from .base import *  # noqa: F401,F403
+
+# Quick-start development settings - unsuitable for production
+# See https://docs.djangoproject.com/en/2.2/howto/deployment/checklist/
+
+# SECURITY WARNING: keep the secret key used in production secret!
+SECRET_KEY = '^ld@ioxhmg)=!!-rh-!kcrol$&8#k$l$8c)ce_dufim%+*c7t='
+
+DEBUG = True
+
+# runserver и так пишет каждый запрос.
+LOGGING = copy.deepcopy(LOGGING)
+LOGGING['loggers']['webapp.requests']['level'] = 'WARNING'
@@ -0,0 +1,66 @@
+"""
+Production settings. Required environment:
+
+    BLOG_SECRET_KEY     - secret key
+    BLOG_ALLOWED_HOSTS  - comma separated host names
+
+Optional: BLOG_DB_PATH, BLOG_MEMCACHED (comma separated host:port, default 127.0.0.1:11211),
+BLOG_STATIC_ROOT, BLOG_CONN_MAX_AGE.
+"""
+
+import copy
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .base import *  # noqa: F401,F403
+
+
+def env(name, default=None):
+    value = os.environ.get(name, default)
+    if value is None:
+        raise ImproperlyConfigured('Set the %s environment variable' % name)
+    return value
+
+
+SECRET_KEY = env('BLOG_SECRET_KEY')
+
+DEBUG = env('BLOG_DEBUG', '').lower() in ('1', 'true', 'yes')
+
+if DEBUG:
+    # DEBUG хранит в памяти каждый SQL-запрос и отдаёт трассировки наружу.
+    raise ImproperlyConfigured('DEBUG must not be enabled with BLOG_ENV=prod')
+
+ALLOWED_HOSTS = [host.strip() for host in env('BLOG_ALLOWED_HOSTS').split(',') if host.strip()]
+
+# base.py делится между профилями, поэтому вложенные настройки копируются, а не правятся на месте.
+TEMPLATES = copy.deepcopy(TEMPLATES)
+TEMPLATES[0]['APP_DIRS'] = False
+TEMPLATES[0]['OPTIONS']['loaders'] = [
+    ('django.template.loaders.cached.Loader', [
+        'django.template.loaders.filesystem.Loader',
+        'django.template.loaders.app_directories.Loader',
+    ]),
+]
+
+DATABASES = copy.deepcopy(DATABASES)
+DATABASES['default']['NAME'] = env('BLOG_DB_PATH', DATABASES['default']['NAME'])
+DATABASES['default']['CONN_MAX_AGE'] = int(env('BLOG_CONN_MAX_AGE', 600))
+
+SQLITE_PRAGMAS = dict(
+    SQLITE_PRAGMAS,
+    mmap_size=256 * 1024 * 1024,
+    temp_store='MEMORY',
+)
+
+# Кеш общий для всех процессов, поэтому инвалидация по поколениям видна каждому воркеру.
+# Не FileBasedCache: в Django 2.2 он просматривает весь каталог при каждом set() (_cull), а страницы,
+# строки списка и поколения пишутся на горячих путях. memcached вытесняет старые поколения сам (LRU).
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.MemcachedCache',
+        'LOCATION': [host.strip() for host in env('BLOG_MEMCACHED', '127.0.0.1:11211').split(',') if host.strip()],
+    }
+}
+
+STATIC_ROOT = env('BLOG_STATIC_ROOT', os.path.join(BASE_DIR, 'static'))
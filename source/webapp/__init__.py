@@ -0,0 +1 @@
+default_app_config = 'webapp.apps.WebappConfig'
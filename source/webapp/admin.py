@@ -9,13 +9,13 @@ class CommentAdmin(admin.TabularInline):
 
 
 class ArticleAdmin(admin.ModelAdmin):
-    list_display = ['pk', 'title', 'author', 'created_at']
+    list_display = ['pk', 'title', 'author', 'created_at', 'comments_count', 'views_count']
     list_filter = ['author']
     list_display_links = ['pk', 'title']
     exclude = []
     filter_horizontal = ['tags']
     search_fields = ['title', 'text']
-    readonly_fields = ['created_at', 'updated_at']
+    readonly_fields = ['created_at', 'updated_at', 'comments_count', 'last_commented_at', 'views_count']
     inlines = [CommentAdmin]
 
 
@@ -3,3 +3,6 @@ from django.apps import AppConfig
 
 class WebappConfig(AppConfig):
     name = 'webapp'
+
+    def ready(self):
+        import webapp.signals  # noqa: F401
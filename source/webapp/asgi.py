@@ -0,0 +1,132 @@
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+
+
+def get_environ(scope, body):
+    """WSGI environ для HTTP-запроса ASGI."""
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode('utf8').decode('latin1'),
+        'PATH_INFO': scope['path'].encode('utf8').decode('latin1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1').upper().replace('-', '_')
+        if name not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            name = 'HTTP_' + name
+        value = value.decode('latin1')
+        environ[name] = '%s,%s' % (environ[name], value) if name in environ else value
+    return environ
+
+
+def start_message(status, headers):
+    return {
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in headers],
+    }
+
+
+class AsgiHandler:
+    """
+    ASGI 3 приложение поверх WSGI-приложения Django 2.2, у которого нет ни ASGI, ни async-представлений.
+    Чтение тела запроса и отправка ответа идут в цикле событий, а само представление
+    выполняется в пуле из ASGI_THREADS потоков. Медленный клиент держит только корутину,
+    а число одновременных обращений к SQLite ограничено размером пула. Потоковый ответ
+    от представления до close() отдаётся из одного потока пула.
+    """
+
+    def __init__(self, wsgi_application, max_workers=None):
+        self.wsgi_application = wsgi_application
+        self.executor = ThreadPoolExecutor(max_workers or settings.ASGI_THREADS, thread_name_prefix='asgi')
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await self.lifespan(receive, send)
+        elif scope['type'] == 'http':
+            await self.http(scope, receive, send)
+        else:
+            raise ValueError('Unsupported ASGI scope type %r' % scope['type'])
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                from webapp.comment_queue import comment_queue
+                from webapp.view_counter import view_counter
+                loop = asyncio.get_running_loop()
+                await loop.run_in_executor(self.executor, comment_queue.flush)
+                await loop.run_in_executor(self.executor, view_counter.flush)
+                self.executor.shutdown()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def http(self, scope, receive, send):
+        parts = []
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            parts.append(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+
+        loop = asyncio.get_running_loop()
+
+        def send_from_thread(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        environ = get_environ(scope, b''.join(parts))
+        response = await loop.run_in_executor(self.executor, self.run_wsgi, environ, send_from_thread)
+        if response is None:
+            return
+        status, headers, body = response
+        await send(start_message(status, headers))
+        await send({'type': 'http.response.body', 'body': body})
+
+    def run_wsgi(self, environ, send):
+        """
+        Выполняет запрос в потоке пула. Обычный ответ возвращается целиком и отправляется в цикле событий,
+        потоковый отдаётся здесь же через send и возвращается None.
+        """
+        response = {}
+
+        def start_response(status, headers, exc_info=None):
+            response['status'] = int(status.split(' ', 1)[0])
+            response['headers'] = headers
+
+        result = self.wsgi_application(environ, start_response)
+        # Ответ читается и закрывается в том же потоке: курсор потокового ответа (экспорт) открыт
+        # на соединении этого потока, а по request_finished Django закрывает соединения именно этого потока.
+        try:
+            if getattr(result, 'streaming', False):
+                # Поток ждёт, пока клиент примет кусок: медленный клиент держит место в пуле, но не копит ответ в памяти.
+                send(start_message(response['status'], response['headers']))
+                for chunk in result:
+                    send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                send({'type': 'http.response.body', 'body': b''})
+                return None
+            body = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        return response['status'], response['headers'], body
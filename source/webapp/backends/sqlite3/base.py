@@ -0,0 +1,16 @@
+"""
+SQLite backend whose transactions take the write lock up front.
+
+Django opens transactions with a plain BEGIN, so SQLite defers locking until
+the first write. A transaction that has already read can then fail to upgrade
+with "database is locked" without waiting for the busy timeout. BEGIN IMMEDIATE
+acquires the write lock when the transaction starts, so concurrent writers queue
+on busy_timeout instead of failing half way.
+"""
+
+from django.db.backends.sqlite3 import base
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute('BEGIN IMMEDIATE')
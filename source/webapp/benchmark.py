@@ -0,0 +1,252 @@
+import asyncio
+import statistics
+import threading
+import time
+import tracemalloc
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.handlers.wsgi import WSGIHandler
+from django.db import connection
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import reverse
+
+from webapp.asgi import AsgiHandler, get_environ
+from webapp.models import Article, Comment, Tag
+
+SERVER_SCENARIOS = ('index', 'index_by_tag', 'article', 'search_text')
+CSRF_TOKEN = 'b' * 64
+
+
+def percentile(values, percent):
+    if not values:
+        return None
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(percent / 100 * len(values) + 0.5)) - 1))
+    return values[index]
+
+
+def default_scenarios():
+    """Сценарии по всем URL из webapp/urls.py на данных текущей базы."""
+    article = Article.objects.order_by('-comments_count').first()
+    tag = Tag.objects.annotate(used=Count('articles')).order_by('-used').first()
+    comment = Comment.objects.order_by('-pk').first()
+    scenarios = [
+        ('index', 'get', reverse('index'), None),
+        ('index_page_10', 'get', reverse('index'), {'page': 10}),
+        ('index_by_comments', 'get', reverse('index'), {'order': 'comments'}),
+        ('comments', 'get', reverse('comment_index'), None),
+        ('search_form', 'get', reverse('article_search'), None),
+        ('search_text', 'post', reverse('article_search'),
+         {'text': 'python', 'in_title': 'on', 'in_text': 'on', 'in_tags': 'on', 'in_comment_text': 'on'}),
+        ('search_text_get', 'get', reverse('article_search'),
+         {'text': 'python', 'in_title': 'on', 'in_text': 'on', 'in_tags': 'on', 'in_comment_text': 'on'}),
+        ('search_author', 'post', reverse('article_search'),
+         {'author': 'Author 1', 'in_articles': 'on', 'in_comments': 'on'}),
+        ('article_add_form', 'get', reverse('article_add'), None),
+        ('comment_add_form', 'get', reverse('comment_add'), None),
+        ('article_lookup', 'get', reverse('article_lookup'), {'q': 'py'}),
+        ('api_articles', 'get', reverse('api_article_list'), {'embed': 'tags'}),
+        ('api_batch', 'get', reverse('api_article_batch'), {'ids': '1,2,3,4,5'}),
+    ]
+    if tag:
+        scenarios.append(('index_by_tag', 'get', reverse('index'), {'search': tag.name}))
+    if article:
+        scenarios += [
+            ('article', 'get', reverse('article_view', kwargs={'pk': article.pk}), None),
+            ('article_update_form', 'get', reverse('article_update', kwargs={'pk': article.pk}), None),
+            ('article_delete_form', 'get', reverse('article_delete', kwargs={'pk': article.pk}), None),
+        ]
+    if comment:
+        scenarios += [
+            ('comment_update_form', 'get', reverse('comment_update', kwargs={'pk': comment.pk}), None),
+            ('comment_delete_form', 'get', reverse('comment_delete', kwargs={'pk': comment.pk}), None),
+        ]
+    return scenarios
+
+
+def measure(client, method, url, data, requests, cold=False):
+    timings, queries, statuses = [], [], set()
+    for _ in range(requests):
+        if cold:
+            cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            started = time.perf_counter()
+            response = getattr(client, method)(url, data)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            timings.append((time.perf_counter() - started) * 1000)
+        queries.append(len(context))
+        statuses.add(response.status_code)
+
+    if cold:
+        cache.clear()
+    tracemalloc.start()
+    getattr(client, method)(url, data)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'requests': requests,
+        'status': sorted(statuses),
+        'p50_ms': round(percentile(timings, 50), 3),
+        'p95_ms': round(percentile(timings, 95), 3),
+        'mean_ms': round(statistics.mean(timings), 3),
+        'queries': max(queries),
+        'peak_memory_kb': round(peak / 1024, 1),
+    }
+
+
+def run(requests=20, warmup=2, cold=False, only=None):
+    client = Client()
+    results = {}
+    with override_settings(ALLOWED_HOSTS=settings.ALLOWED_HOSTS + ['testserver']):
+        for name, method, url, data in default_scenarios():
+            if only and name not in only:
+                continue
+            for _ in range(warmup):
+                getattr(client, method)(url, data)
+            results[name] = measure(client, method, url, data, requests, cold)
+    return results
+
+
+def compare(baseline, results, keys=('p50_ms', 'p95_ms', 'queries', 'peak_memory_kb')):
+    """Построчное сравнение двух прогонов: {сценарий: {метрика: (было, стало, изменение %)}}."""
+    diff = {}
+    for name, metrics in results.items():
+        if name not in baseline:
+            continue
+        diff[name] = {}
+        for key in keys:
+            before, after = baseline[name].get(key), metrics.get(key)
+            change = round((after - before) / before * 100, 1) if before else None
+            diff[name][key] = (before, after, change)
+    return diff
+
+
+def asgi_request(method, url, data):
+    """scope и тело ASGI-запроса для сценария; POST уходит с одинаковым CSRF-токеном в cookie и в форме."""
+    headers = [(b'host', b'testserver')]
+    query, body = b'', b''
+    if method == 'post':
+        body = urlencode(dict(data, csrfmiddlewaretoken=CSRF_TOKEN)).encode()
+        headers += [
+            (b'content-type', b'application/x-www-form-urlencoded'),
+            (b'content-length', str(len(body)).encode()),
+            (b'cookie', ('csrftoken=%s' % CSRF_TOKEN).encode()),
+        ]
+    elif data:
+        query = urlencode(data).encode()
+    scope = {
+        'type': 'http', 'http_version': '1.1', 'scheme': 'http', 'method': method.upper(),
+        'path': url, 'root_path': '', 'query_string': query, 'headers': headers,
+        'server': ('testserver', 80), 'client': ('127.0.0.1', 0),
+    }
+    return scope, body
+
+
+def load_summary(latencies, statuses, elapsed):
+    return {
+        'requests': len(latencies),
+        'errors': sum(1 for status in statuses if status >= 400),
+        'rps': round(len(latencies) / elapsed, 1),
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'max_ms': round(max(latencies), 3),
+    }
+
+
+def load_wsgi(jobs, concurrency, workers, client_delay):
+    """
+    concurrency клиентов против workers синхронных воркеров: воркер занят запросом
+    и отдачей ответа медленному клиенту (client_delay секунд), как в WSGI-сервере.
+    """
+    application = WSGIHandler()
+    slots = threading.Semaphore(workers)
+    jobs, lock = iter(jobs), threading.Lock()
+    latencies, statuses = [], []
+
+    def start_response(status, headers, exc_info=None):
+        statuses.append(int(status.split(' ', 1)[0]))
+
+    def client():
+        try:
+            while True:
+                with lock:
+                    job = next(jobs, None)
+                if job is None:
+                    return
+                started = time.perf_counter()
+                with slots:
+                    result = application(get_environ(*job), start_response)
+                    b''.join(result)
+                    result.close()
+                    time.sleep(client_delay)
+                latencies.append((time.perf_counter() - started) * 1000)
+        finally:
+            connection.close()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return load_summary(latencies, statuses, time.perf_counter() - started)
+
+
+def load_asgi(jobs, concurrency, threads, client_delay):
+    """Те же клиенты против AsgiHandler: отдача ответа ждёт в цикле событий, а не в потоке."""
+    handler = AsgiHandler(WSGIHandler(), threads)
+    jobs = iter(jobs)
+    latencies, statuses = [], []
+
+    async def client():
+        for scope, body in jobs:
+            async def receive():
+                return {'type': 'http.request', 'body': body, 'more_body': False}
+
+            async def send(message):
+                if message['type'] == 'http.response.start':
+                    statuses.append(message['status'])
+                elif not message.get('more_body'):
+                    await asyncio.sleep(client_delay)
+
+            started = time.perf_counter()
+            await handler(scope, receive, send)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    async def main():
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+
+    started = time.perf_counter()
+    try:
+        asyncio.run(main())
+    finally:
+        handler.executor.shutdown()
+    return load_summary(latencies, statuses, time.perf_counter() - started)
+
+
+def run_servers(requests=200, concurrency=16, client_delay=0.02, workers=None, threads=None, only=None):
+    """
+    Нагрузка на страницы чтения через WSGI (workers синхронных воркеров) и через blog/asgi.py
+    (один процесс, threads потоков для БД, по умолчанию ASGI_THREADS): запросы в секунду и хвосты задержек.
+    По умолчанию воркеров столько же, сколько потоков, чтобы у обоих серверов было одинаково мест для запросов к БД.
+    """
+    threads = threads or settings.ASGI_THREADS
+    workers = workers or threads
+    scenarios = [
+        asgi_request(method, url, data) for name, method, url, data in default_scenarios()
+        if name in (only or SERVER_SCENARIOS)
+    ]
+    jobs = [scenarios[number % len(scenarios)] for number in range(requests)]
+    with override_settings(ALLOWED_HOSTS=settings.ALLOWED_HOSTS + ['testserver']):
+        load_wsgi(scenarios, 1, 1, 0)
+        return {
+            'wsgi': load_wsgi(jobs, concurrency, workers, client_delay),
+            'asgi': load_asgi(jobs, concurrency, threads, client_delay),
+        }
@@ -0,0 +1,141 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+
+def row_version_key(pk):
+    return 'article_row_version:%d' % pk
+
+
+ROW_GENERATION_KEY = 'article_row_generation'
+
+
+def article_row_key(article, version, generation):
+    return 'article_row:%d:%s:%s:%s' % (article.pk, article.updated_at.timestamp(), version, generation)
+
+
+def article_row_generation():
+    """Общее поколение строк списка: массовые операции сбрасывают все строки одним ключом."""
+    generation = cache.get(ROW_GENERATION_KEY)
+    if generation is None:
+        cache.add(ROW_GENERATION_KEY, time.time(), None)
+        generation = cache.get(ROW_GENERATION_KEY)
+    return generation
+
+
+def invalidate_all_article_rows():
+    cache.set(ROW_GENERATION_KEY, time.time(), None)
+
+
+def get_row_versions(pks):
+    versions = cache.get_many([row_version_key(pk) for pk in pks])
+    missing = [row_version_key(pk) for pk in pks if row_version_key(pk) not in versions]
+    if missing:
+        # Версия, вытесненная из кеша, начинается заново, а не с нуля: иначе снова стала бы
+        # достижимой строка, закешированная до первой инвалидации.
+        for key in missing:
+            cache.add(key, time.time(), settings.ARTICLE_ROW_CACHE_TIMEOUT)
+        versions.update(cache.get_many(missing))
+    return {pk: versions[row_version_key(pk)] for pk in pks}
+
+
+def invalidate_article_rows(pks):
+    """Меняет версию набора тегов статей, старые фрагменты становятся недостижимы."""
+    version = time.time()
+    cache.set_many({row_version_key(pk): version for pk in pks}, settings.ARTICLE_ROW_CACHE_TIMEOUT)
+
+
+def get_article_rows(articles):
+    versions = get_row_versions([article.pk for article in articles])
+    generation = article_row_generation()
+    keys = {article.pk: article_row_key(article, versions[article.pk], generation) for article in articles}
+    return keys, cache.get_many(list(keys.values()))
+
+
+def set_article_rows(rows):
+    cache.set_many(rows, settings.ARTICLE_ROW_CACHE_TIMEOUT)
+
+
+PAGE_GENERATION_KEY = 'page_cache_generation'
+
+
+def page_cache_generation():
+    """Время последнего изменения статей, тегов или комментариев; входит в ключи кеша страниц."""
+    generation = cache.get(PAGE_GENERATION_KEY)
+    if generation is None:
+        cache.add(PAGE_GENERATION_KEY, time.time(), None)
+        generation = cache.get(PAGE_GENERATION_KEY)
+    return generation
+
+
+def bump_page_cache_generation():
+    cache.set(PAGE_GENERATION_KEY, time.time(), None)
+
+
+VIEWS_FLUSHED_KEY = 'views_flushed_at'
+
+
+def views_flushed_at():
+    """Время последней записи счётчиков просмотров; страницы с сортировкой по просмотрам зависят от него."""
+    return cache.get(VIEWS_FLUSHED_KEY, 0)
+
+
+def mark_views_flushed():
+    cache.set(VIEWS_FLUSHED_KEY, time.time(), None)
+
+
+SEARCH_ARTICLES = 'articles'
+SEARCH_TAGS = 'tags'
+SEARCH_COMMENTS = 'comments'
+SEARCH_VIEWS = 'views'
+
+
+def search_generation_key(kind):
+    return 'search_generation:%s' % kind
+
+
+def search_generations(kinds):
+    """Время последнего изменения данных каждого вида; закешированный результат поиска сверяется с ними."""
+    keys = [search_generation_key(kind) for kind in kinds]
+    values = cache.get_many(keys)
+    missing = [key for key in keys if key not in values]
+    if missing:
+        # Как и у page_cache_generation: после очистки кеша поколение начинается заново, а не с нуля,
+        # иначе записи, сохранённые до очистки, снова сочлись бы актуальными.
+        for key in missing:
+            cache.add(key, time.time(), None)
+        values.update(cache.get_many(missing))
+    return tuple(values[key] for key in keys)
+
+
+def bump_search_generation(*kinds):
+    cache.set_many({search_generation_key(kind): time.time() for kind in kinds}, None)
+
+
+def page_cache_key(request, generation):
+    return 'page:%s:%s' % (generation, hashlib.md5(request.get_full_path().encode()).hexdigest())
+
+
+def get_cached_page(request, generation):
+    return cache.get(page_cache_key(request, generation))
+
+
+def set_cached_page(request, generation, page):
+    cache.set(page_cache_key(request, generation), page, settings.PAGE_CACHE_TIMEOUT)
+
+
+TAG_CLOUD_KEY = 'tag_cloud'
+
+
+def get_tag_cloud():
+    return cache.get(TAG_CLOUD_KEY)
+
+
+def set_tag_cloud(content):
+    cache.set(TAG_CLOUD_KEY, content, settings.TAG_CLOUD_CACHE_TIMEOUT)
+
+
+def invalidate_tag_cloud():
+    cache.delete(TAG_CLOUD_KEY)
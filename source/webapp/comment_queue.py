@@ -0,0 +1,166 @@
+import atexit
+import json
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import connection
+
+from webapp.cache import SEARCH_COMMENTS, bump_page_cache_generation, bump_search_generation, invalidate_article_rows
+from webapp.counters import recount_comments
+from webapp.db import write_atomic
+from webapp.models import Article, Comment
+from webapp.search import update_comment_terms
+
+logger = logging.getLogger('webapp.comment_queue')
+
+
+class CommentQueue:
+    """
+    Очередь комментариев в памяти процесса (COMMENT_QUEUE = True).
+    Фоновый поток собирает комментарии в пачки до COMMENT_QUEUE_BATCH_SIZE штук
+    или COMMENT_QUEUE_INTERVAL секунд и пишет каждую одной транзакцией через bulk_create.
+    bulk_create не шлёт сигналы, поэтому счётчики, поисковый индекс и кеш
+    обновляются после записи для всей пачки сразу. Если пачка не записалась, комментарии
+    пишутся по одному, а не записанный возвращается в очередь (не больше COMMENT_QUEUE_RETRIES раз).
+    """
+
+    def __init__(self):
+        self.queue = None
+        self.thread = None
+        self.lock = threading.Lock()
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+        self.last_batch_size = 0
+        self.last_batch_ms = 0.0
+        self.max_batch_ms = 0.0
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                if self.queue is None:
+                    self.queue = queue.Queue(settings.COMMENT_QUEUE_MAX_SIZE)
+                self.thread = threading.Thread(target=self.run, name='comment-queue', daemon=True)
+                self.thread.start()
+
+    def put(self, comment):
+        """Ставит несохранённый комментарий в очередь; False, если очередь переполнена."""
+        self.start()
+        try:
+            self.queue.put_nowait(comment)
+        except queue.Full:
+            return False
+        return True
+
+    def depth(self):
+        return self.queue.qsize() if self.queue is not None else 0
+
+    def take(self, block=True):
+        batch = []
+        try:
+            batch.append(self.queue.get(block=block))
+        except queue.Empty:
+            return batch
+        deadline = time.monotonic() + settings.COMMENT_QUEUE_INTERVAL
+        while len(batch) < settings.COMMENT_QUEUE_BATCH_SIZE:
+            timeout = deadline - time.monotonic()
+            try:
+                if block and timeout > 0:
+                    batch.append(self.queue.get(timeout=timeout))
+                else:
+                    batch.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            batch = self.take()
+            try:
+                self.write(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+                connection.close_if_unusable_or_obsolete()
+
+    def write(self, batch):
+        started = time.perf_counter()
+        try:
+            written = write_atomic(self.save)(batch)
+        except Exception:
+            if len(batch) > 1:
+                # Один плохой комментарий не должен терять остальные: пользователю уже ответили, что они приняты.
+                logger.exception('Comment batch of %d not written, writing comments one by one', len(batch))
+                for comment in batch:
+                    self.write([comment])
+            else:
+                self.retry(batch[0])
+            return
+        duration = (time.perf_counter() - started) * 1000
+        self.batches += 1
+        self.written += written
+        self.last_batch_size = len(batch)
+        self.last_batch_ms = duration
+        self.max_batch_ms = max(self.max_batch_ms, duration)
+        logger.info(json.dumps({'size': len(batch), 'ms': round(duration, 2), 'depth': self.depth()}))
+
+    def retry(self, comment):
+        comment._queue_attempts = getattr(comment, '_queue_attempts', 0) + 1
+        if comment._queue_attempts <= settings.COMMENT_QUEUE_RETRIES:
+            try:
+                self.queue.put_nowait(comment)
+            except queue.Full:
+                pass
+            else:
+                logger.exception('Comment not written, retry %d of %d',
+                                 comment._queue_attempts, settings.COMMENT_QUEUE_RETRIES)
+                return
+        self.failed += 1
+        logger.exception('Comment lost: %s', json.dumps(
+            {'article': comment.article_id, 'author': comment.author, 'text': comment.text}, ensure_ascii=False))
+
+    def save(self, batch):
+        # Статью могли удалить, пока комментарий ждал в очереди.
+        article_ids = set(Article.objects.filter(
+            pk__in={comment.article_id for comment in batch}
+        ).values_list('pk', flat=True))
+        comments = Comment.objects.bulk_create([comment for comment in batch if comment.article_id in article_ids])
+        recount_comments(article_ids)
+        update_comment_terms(added=[(comment.article_id, comment.text) for comment in comments])
+        invalidate_article_rows(article_ids)
+        bump_page_cache_generation()
+        bump_search_generation(SEARCH_COMMENTS)
+        return len(comments)
+
+    def flush(self):
+        """Пишет всё, что накопилось, в текущем потоке и дожидается пачки, которую пишет фоновый поток."""
+        if self.queue is None:
+            return
+        while True:
+            batch = self.take(block=False)
+            if not batch:
+                break
+            try:
+                self.write(batch)
+            finally:
+                for _ in batch:
+                    self.queue.task_done()
+        self.queue.join()
+
+    def stats(self):
+        return {
+            'depth': self.depth(),
+            'batches': self.batches,
+            'written': self.written,
+            'failed': self.failed,
+            'last_batch_size': self.last_batch_size,
+            'last_batch_ms': round(self.last_batch_ms, 2),
+            'max_batch_ms': round(self.max_batch_ms, 2),
+        }
+
+
+comment_queue = CommentQueue()
+atexit.register(comment_queue.flush)
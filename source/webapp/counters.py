@@ -0,0 +1,85 @@
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from webapp.cache import invalidate_tag_cloud
+from webapp.models import Article, Comment, Tag, TagStats
+
+
+def last_comment_subquery():
+    comments = Comment.objects.filter(article=OuterRef('pk')).order_by('-created_at')
+    return Subquery(comments.values('created_at')[:1])
+
+
+def comment_added(comment):
+    Article.objects.filter(pk=comment.article_id).update(
+        comments_count=F('comments_count') + 1,
+        last_commented_at=comment.created_at,
+    )
+
+
+def comment_removed(comment):
+    Article.objects.filter(pk=comment.article_id, comments_count__gt=0).update(
+        comments_count=F('comments_count') - 1,
+        last_commented_at=last_comment_subquery(),
+    )
+
+
+def recount_comments(article_ids=None):
+    """Пересчитывает счётчики комментариев одним UPDATE, возвращает число статей."""
+    counts = Comment.objects.filter(article=OuterRef('pk')).order_by() \
+        .values('article').annotate(count=Count('pk')).values('count')
+    articles = Article.objects.all()
+    if article_ids is not None:
+        articles = articles.filter(pk__in=article_ids)
+    return articles.update(
+        comments_count=Coalesce(Subquery(counts), 0),
+        last_commented_at=last_comment_subquery(),
+    )
+
+
+def tag_last_used_subquery():
+    articles = Article.objects.filter(tags=OuterRef('tag')).order_by('-created_at')
+    return Subquery(articles.values('created_at')[:1])
+
+
+def ensure_tag_stats(tag_ids):
+    """Строки статистики для тегов, созданных через bulk_create (resolve_tags) и не попавших в сигналы."""
+    existing = set(TagStats.objects.filter(tag__in=tag_ids).values_list('tag', flat=True))
+    missing = [tag_id for tag_id in tag_ids if tag_id not in existing]
+    if missing:
+        TagStats.objects.bulk_create([
+            TagStats(tag_id=pk, name=slug) for pk, slug in Tag.objects.filter(pk__in=missing).values_list('pk', 'slug')
+        ], ignore_conflicts=True)
+
+
+def tags_attached(tag_ids, count, newest):
+    """count статей получили каждый из тегов; newest - время создания самой новой из них."""
+    ensure_tag_stats(tag_ids)
+    stats = TagStats.objects.filter(tag__in=tag_ids)
+    stats.update(articles_count=F('articles_count') + count)
+    stats.filter(Q(last_used_at__isnull=True) | Q(last_used_at__lt=newest)).update(last_used_at=newest)
+    invalidate_tag_cloud()
+
+
+def recount_tags(tag_ids=None):
+    """
+    Пересчитывает статистику тегов по связям со статьями, возвращает число тегов.
+    Добавление тега считается инкрементально (tags_attached), а снятие - пересчётом только затронутых тегов.
+    """
+    tags = Tag.objects.all()
+    if tag_ids is not None:
+        tags = tags.filter(pk__in=tag_ids)
+    ensure_tag_stats(list(tags.values_list('pk', flat=True)))
+    counts = Article.tags.through.objects.filter(tag=OuterRef('tag')).order_by() \
+        .values('tag').annotate(count=Count('pk')).values('count')
+    names = Tag.objects.filter(pk=OuterRef('tag')).values('slug')
+    stats = TagStats.objects.all()
+    if tag_ids is not None:
+        stats = stats.filter(tag__in=tag_ids)
+    updated = stats.update(
+        name=Subquery(names),
+        articles_count=Coalesce(Subquery(counts), 0),
+        last_used_at=tag_last_used_subquery(),
+    )
+    invalidate_tag_cloud()
+    return updated
@@ -0,0 +1,38 @@
+import functools
+import random
+import time
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, OperationalError, connections, transaction
+
+LOCKED_ERRORS = ('database is locked', 'database table is locked')
+
+
+def is_locked_error(error):
+    return isinstance(error, OperationalError) and str(error) in LOCKED_ERRORS
+
+
+def write_atomic(func=None, using=DEFAULT_DB_ALIAS):
+    """
+    Runs func in a transaction and repeats it with exponential backoff while
+    SQLite reports the database as locked (SQLITE_WRITE_RETRIES attempts).
+    Inside an outer transaction there is nothing to retry, so the error is raised.
+    """
+    if func is None:
+        return functools.partial(write_atomic, using=using)
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        delay = settings.SQLITE_WRITE_RETRY_DELAY
+        for attempt in range(settings.SQLITE_WRITE_RETRIES + 1):
+            nested = connections[using].in_atomic_block
+            try:
+                with transaction.atomic(using=using):
+                    return func(*args, **kwargs)
+            except OperationalError as error:
+                if nested or attempt == settings.SQLITE_WRITE_RETRIES or not is_locked_error(error):
+                    raise
+            time.sleep(delay * random.uniform(0.5, 1.5))
+            delay *= 2
+
+    return wrapper
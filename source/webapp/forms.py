@@ -1,6 +1,7 @@
 from django import forms
 from django.forms import widgets, ValidationError
-from webapp.models import Category, Article
+from webapp.models import Category, Article, SearchTerm
+from webapp.widgets import LookupSelect
 
 
 class ArticleForm(forms.Form):
@@ -9,7 +10,7 @@ class ArticleForm(forms.Form):
     text = forms.CharField(max_length=3000, label='Text', required=True,
                            widget=widgets.Textarea)
     category = forms.ModelChoiceField(queryset=Category.objects.all(), required=False, label='Category',
-                                      empty_label=None)
+                                      empty_label=None, widget=LookupSelect('category_lookup'))
     tags = forms.CharField(max_length=256, label='Tags', required=False)
 
     def clean_tags(self):
@@ -23,7 +24,7 @@ class ArticleForm(forms.Form):
 
 class CommentForm(forms.Form):
     article = forms.ModelChoiceField(queryset=Article.objects.all(), required=True, label='Article',
-                                     empty_label=None)
+                                     empty_label=None, widget=LookupSelect('article_lookup'))
     author = forms.CharField(max_length=40, required=False, label='Author', initial='Аноним')
     text = forms.CharField(max_length=400, required=True, label='Text',
                            widget=widgets.Textarea)
@@ -36,10 +37,27 @@ class CommentInArticleForm(forms.Form):
 
 
 class SimpleSearchForm(forms.Form):
-    search = forms.CharField(max_length=100, required=False, label='Найти')
+    MATCH_ANY = 'any'
+    MATCH_ALL = 'all'
+    MATCH_CHOICES = (
+        (MATCH_ANY, 'Любой из тегов'),
+        (MATCH_ALL, 'Все теги'),
+    )
+
+    search = forms.CharField(max_length=100, required=False, label='Найти',
+                             help_text='Несколько тегов через запятую')
+    match = forms.ChoiceField(choices=MATCH_CHOICES, required=False, label='Теги')
+    order = forms.ChoiceField(choices=Article.ORDER_CHOICES, required=False, label='Сортировка')
 
 
 class FullSearchForm(forms.Form):
+    INDEX_FIELDS = (
+        ('in_title', SearchTerm.FIELD_TITLE),
+        ('in_text', SearchTerm.FIELD_TEXT),
+        ('in_tags', SearchTerm.FIELD_TAGS),
+        ('in_comment_text', SearchTerm.FIELD_COMMENTS),
+    )
+
     text = forms.CharField(max_length=100, required=False, label='Текст')
     in_title = forms.BooleanField(initial=True, required=False, label='В заголовки')
     in_text = forms.BooleanField(initial=True, required=False, label='В тексте')
@@ -48,6 +66,8 @@ class FullSearchForm(forms.Form):
     author = forms.CharField(max_length=100, required=False, label='Автор')
     in_articles = forms.BooleanField(initial=True, required=False, label='В статьях')
     in_comments = forms.BooleanField(initial=True, required=False, label='В комментариеях')
+    order = forms.ChoiceField(choices=(('', 'По релевантности'),) + Article.ORDER_CHOICES, required=False,
+                              label='Сортировка')
 
     def clean(self):
         super().clean()
@@ -72,3 +92,6 @@ class FullSearchForm(forms.Form):
             raise ValidationError('Заполните хотя бы одно поле(поиск по автору или же по тексту?)',
                                   code='search_field_not_selected')
         return self.cleaned_data
+
+    def get_index_fields(self):
+        return [field for flag, field in self.INDEX_FIELDS if self.cleaned_data.get(flag)]
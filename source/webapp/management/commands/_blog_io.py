@@ -0,0 +1,95 @@
+import datetime
+import gzip
+import io
+import sys
+import time
+from contextlib import contextmanager
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from webapp.cache import (SEARCH_ARTICLES, SEARCH_COMMENTS, SEARCH_TAGS, bump_page_cache_generation,
+                          bump_search_generation, invalidate_all_article_rows)
+from webapp.counters import recount_comments, recount_tags
+from webapp.related import rebuild_related
+from webapp.search import rebuild_index
+
+
+class ExportEncoder(DjangoJSONEncoder):
+    """DjangoJSONEncoder обрезает время до миллисекунд, для восстановления нужны микросекунды."""
+
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def open_stream(path, mode, compress=None):
+    """Файл NDJSON, при необходимости сжатый gzip; '-' означает stdin/stdout."""
+    if compress is None:
+        compress = path.endswith('.gz')
+    if path == '-':
+        raw = sys.stdin.buffer if mode == 'r' else sys.stdout.buffer
+        if compress:
+            raw = gzip.GzipFile(fileobj=raw, mode=mode + 'b')
+        return io.TextIOWrapper(raw, encoding='utf-8')
+    if compress:
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+class Progress:
+    def __init__(self, stream, report_every=10000):
+        self.stream = stream
+        self.report_every = report_every
+        self.started = time.monotonic()
+        self.counts = {}
+        self.total = 0
+
+    def add(self, model, count=1):
+        before = self.total
+        self.counts[model] = self.counts.get(model, 0) + count
+        self.total += count
+        if self.report_every and self.total // self.report_every != before // self.report_every:
+            self.report()
+
+    def rate(self):
+        elapsed = time.monotonic() - self.started
+        return self.total / elapsed if elapsed else 0.0
+
+    def report(self):
+        self.stream.write('%d rows (%.0f rows/s)' % (self.total, self.rate()))
+
+    def summary(self):
+        elapsed = time.monotonic() - self.started
+        counts = ', '.join('%s: %d' % item for item in self.counts.items())
+        return '%s; %d rows in %.1fs (%.0f rows/s)' % (counts, self.total, elapsed, self.rate())
+
+
+@contextmanager
+def keep_timestamps(*models):
+    """Отключает auto_now/auto_now_add, чтобы bulk_create сохранил даты из выгрузки."""
+    fields = [(field, field.auto_now, field.auto_now_add)
+              for model in models for field in model._meta.concrete_fields
+              if getattr(field, 'auto_now', False) or getattr(field, 'auto_now_add', False)]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now, field.auto_now_add = auto_now, auto_now_add
+
+
+def rebuild_derived():
+    """
+    bulk_create не отправляет сигналы, поэтому производные данные пересчитываются отдельно.
+    Строки новых статей и так не в кеше (ключ включает updated_at), а у старых могли поменяться
+    счётчики и похожие статьи, поэтому сбрасывается общее поколение строк, а не ключ на статью.
+    """
+    rebuild_index()
+    recount_comments()
+    recount_tags()
+    rebuild_related()
+    invalidate_all_article_rows()
+    bump_page_cache_generation()
+    bump_search_generation(SEARCH_ARTICLES, SEARCH_TAGS, SEARCH_COMMENTS)
@@ -0,0 +1,58 @@
+import json
+
+from django.core.management.base import BaseCommand
+
+from webapp import benchmark
+
+
+class Command(BaseCommand):
+    help = 'Прогоняет страницы webapp через тестовый клиент: p50/p95, запросы к БД, пиковая память'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=20, help='Запросов на сценарий')
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--cold', action='store_true', help='Очищать кеш перед каждым запросом')
+        parser.add_argument('--only', nargs='*', help='Имена сценариев')
+        parser.add_argument('--output', help='Сохранить результаты в JSON')
+        parser.add_argument('--compare', help='JSON предыдущего прогона для сравнения')
+        parser.add_argument('--servers', action='store_true',
+                            help='Сравнить WSGI и ASGI под конкурентной нагрузкой вместо прогона по сценариям')
+        parser.add_argument('--concurrency', type=int, default=16, help='Одновременных клиентов (--servers)')
+        parser.add_argument('--client-delay', type=float, default=20,
+                            help='Сколько мс медленный клиент принимает ответ (--servers)')
+        parser.add_argument('--workers', type=int,
+                            help='Синхронных WSGI-воркеров, по умолчанию столько же, сколько потоков ASGI (--servers)')
+        parser.add_argument('--threads', type=int, help='Потоков ASGI, по умолчанию ASGI_THREADS (--servers)')
+
+    def handle(self, *args, **options):
+        if options['servers']:
+            return self.handle_servers(options)
+        results = benchmark.run(options['requests'], options['warmup'], options['cold'], options['only'])
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+        self.stdout.write('%-22s %9s %9s %8s %10s' % ('scenario', 'p50 ms', 'p95 ms', 'queries', 'peak KB'))
+        for name, metrics in results.items():
+            self.stdout.write('%-22s %9.2f %9.2f %8d %10.1f' % (
+                name, metrics['p50_ms'], metrics['p95_ms'], metrics['queries'], metrics['peak_memory_kb']))
+        if options['compare']:
+            with open(options['compare']) as f:
+                diff = benchmark.compare(json.load(f), results)
+            self.stdout.write('')
+            for name, metrics in diff.items():
+                changes = ', '.join('%s %s -> %s (%s%%)' % (key, *values) for key, values in metrics.items())
+                self.stdout.write('%-22s %s' % (name, changes))
+
+    def handle_servers(self, options):
+        results = benchmark.run_servers(
+            options['requests'], options['concurrency'], options['client_delay'] / 1000,
+            options['workers'], options['threads'], options['only'],
+        )
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(results, f, indent=2, sort_keys=True)
+        self.stdout.write('%-6s %8s %7s %9s %9s %9s %9s' % ('server', 'req/s', 'errors', 'p50 ms', 'p95 ms', 'p99 ms', 'max ms'))
+        for name, metrics in results.items():
+            self.stdout.write('%-6s %8.1f %7d %9.2f %9.2f %9.2f %9.2f' % (
+                name, metrics['rps'], metrics['errors'], metrics['p50_ms'], metrics['p95_ms'],
+                metrics['p99_ms'], metrics['max_ms']))
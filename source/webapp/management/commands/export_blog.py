@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+
+from webapp.management.commands._blog_io import ExportEncoder, Progress, open_stream
+from webapp.models import Article, Category, Comment, Tag
+
+# Порядок важен: при импорте родительские строки должны идти раньше ссылок на них.
+EXPORTS = (
+    ('category', Category.objects.all(), ('id', 'name')),
+    ('tag', Tag.objects.all(), ('id', 'name', 'created_at')),
+    # views_count не восстанавливается из других данных (rebuild_derived), поэтому выгружается.
+    ('article', Article.objects.all(),
+     ('id', 'title', 'text', 'author', 'category_id', 'created_at', 'updated_at', 'views_count')),
+    ('article_tag', Article.tags.through.objects.all(), ('article_id', 'tag_id')),
+    ('comment', Comment.objects.all(), ('id', 'article_id', 'text', 'author', 'created_at', 'updated_at')),
+)
+
+
+class Command(BaseCommand):
+    help = 'Потоково выгружает статьи, категории, теги и комментарии в NDJSON (.gz - со сжатием)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Файл выгрузки или '-' для stdout")
+        parser.add_argument('--gzip', action='store_true', default=None, help='Сжимать gzip независимо от имени файла')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--report-every', type=int, default=100000)
+
+    def handle(self, *args, **options):
+        encoder = ExportEncoder(ensure_ascii=False, separators=(',', ':'))
+        progress = Progress(self.stderr, options['report_every'])
+        with open_stream(options['path'], 'w', options['gzip']) as out:
+            for model, queryset, fields in EXPORTS:
+                for row in queryset.order_by('pk').values(*fields).iterator(chunk_size=options['chunk_size']):
+                    row['model'] = model
+                    out.write(encoder.encode(row))
+                    out.write('\n')
+                    progress.add(model)
+        self.stderr.write(self.style.SUCCESS('Выгружено: %s' % progress.summary()))
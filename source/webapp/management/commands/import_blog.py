@@ -0,0 +1,111 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError, transaction
+from django.utils.dateparse import parse_datetime
+
+from webapp.management.commands._blog_io import Progress, keep_timestamps, open_stream, rebuild_derived
+from webapp.models import Article, Category, Comment, Tag, tag_slug
+from webapp.tags import lookup_tags
+from webapp.text import text_fields
+
+
+class Command(BaseCommand):
+    help = 'Загружает выгрузку export_blog пачками через bulk_create'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="Файл выгрузки или '-' для stdin")
+        parser.add_argument('--gzip', action='store_true', default=None, help='Читать gzip независимо от имени файла')
+        parser.add_argument('--batch-size', type=int, default=2000)
+        parser.add_argument('--report-every', type=int, default=100000)
+        parser.add_argument('--skip-derived', action='store_true',
+                            help='Не перестраивать поисковый индекс и счётчики после загрузки')
+
+    def handle(self, *args, **options):
+        self.tag_ids = {}
+        self.skip_derived = options['skip_derived']
+        self.progress = Progress(self.stderr, options['report_every'])
+        loaders = {
+            'category': self.load_categories,
+            'tag': self.load_tags,
+            'article': self.load_articles,
+            'article_tag': self.load_article_tags,
+            'comment': self.load_comments,
+        }
+        model, batch = None, []
+        with open_stream(options['path'], 'r', options['gzip']) as source, keep_timestamps(Article, Comment, Tag):
+            for line_number, line in enumerate(source, 1):
+                if not line.strip():
+                    continue
+                row = json.loads(line)
+                row_model = row.pop('model', None)
+                if row_model not in loaders:
+                    raise CommandError('Строка %d: неизвестная модель %r' % (line_number, row_model))
+                if row_model != model or len(batch) >= options['batch_size']:
+                    self.flush(loaders, model, batch)
+                    model, batch = row_model, []
+                batch.append(row)
+            self.flush(loaders, model, batch)
+        self.stderr.write(self.style.SUCCESS('Загружено: %s' % self.progress.summary()))
+        if not options['skip_derived']:
+            self.stderr.write('Перестраиваем поисковый индекс и счётчики...')
+            rebuild_derived()
+
+    def flush(self, loaders, model, batch):
+        if not batch:
+            return
+        try:
+            with transaction.atomic():
+                loaders[model](batch)
+        except IntegrityError as e:
+            self.fail(model, e)
+        self.progress.add(model, len(batch))
+
+    def fail(self, model, error):
+        """Пачки до ошибки уже сохранены, производные данные для них пересчитываются, как после полной загрузки."""
+        message = 'Не удалось загрузить %s: %s.' % (model, error)
+        if self.progress.total:
+            message += ' Уже сохранено: %s.' % ', '.join('%s: %d' % item for item in self.progress.counts.items())
+            if self.skip_derived:
+                message += (' Поисковый индекс, счётчики и похожие статьи не пересчитаны: запустите'
+                            ' rebuild_search_index, recount_comments, rebuild_tag_stats и rebuild_related.')
+            else:
+                rebuild_derived()
+                message += ' Поисковый индекс, счётчики и похожие статьи пересчитаны для сохранённых строк.'
+        raise CommandError(message)
+
+    def load_categories(self, rows):
+        Category.objects.bulk_create([Category(id=row['id'], name=row['name']) for row in rows])
+
+    def load_tags(self, rows):
+        names = {tag_slug(row['name']): row for row in rows}
+        found = lookup_tags(list(names))
+        missing = [Tag(name=row['name'], slug=slug, created_at=parse_datetime(row['created_at']))
+                   for slug, row in names.items() if slug not in found]
+        if missing:
+            Tag.objects.bulk_create(missing, ignore_conflicts=True)
+            found = lookup_tags(list(names))
+        for row in rows:
+            self.tag_ids[row['id']] = found[tag_slug(row['name'])].pk
+
+    def load_articles(self, rows):
+        Article.objects.bulk_create([
+            Article(id=row['id'], title=row['title'], text=row['text'], author=row['author'],
+                    category_id=row['category_id'], created_at=parse_datetime(row['created_at']),
+                    updated_at=parse_datetime(row['updated_at']), views_count=row.get('views_count', 0),
+                    **text_fields(row['text']))
+            for row in rows
+        ])
+
+    def load_article_tags(self, rows):
+        Through = Article.tags.through
+        Through.objects.bulk_create([Through(article_id=row['article_id'], tag_id=self.tag_ids[row['tag_id']])
+                                     for row in rows], ignore_conflicts=True)
+
+    def load_comments(self, rows):
+        Comment.objects.bulk_create([
+            Comment(id=row['id'], article_id=row['article_id'], text=row['text'], author=row['author'],
+                    created_at=parse_datetime(row['created_at']), updated_at=parse_datetime(row['updated_at']))
+            for row in rows
+        ])
+
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from webapp.cache import bump_page_cache_generation, invalidate_all_article_rows
+from webapp.related import rebuild_related
+
+
+class Command(BaseCommand):
+    help = 'Пересобирает похожие статьи по общим тегам для всех статей'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Сколько статей сравнивать за одно умножение матриц')
+
+    def handle(self, *args, **options):
+        count = rebuild_related(batch_size=options['batch_size'])
+        invalidate_all_article_rows()
+        bump_page_cache_generation()
+        self.stdout.write(self.style.SUCCESS('Сохранено связей: %d' % count))
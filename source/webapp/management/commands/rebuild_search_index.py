@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from webapp.cache import SEARCH_ARTICLES, bump_search_generation
+from webapp.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = 'Перестраивает поисковый индекс по статьям, тегам и комментариям'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        count = rebuild_index(batch_size=options['batch_size'])
+        # Все закешированные результаты поиска зависят от статей, этого достаточно для сброса.
+        bump_search_generation(SEARCH_ARTICLES)
+        self.stdout.write(self.style.SUCCESS('Проиндексировано статей: %d' % count))
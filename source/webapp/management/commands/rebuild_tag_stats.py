@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from webapp.counters import recount_tags
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает статистику тегов (количество статей, последняя статья) по связям статей с тегами'
+
+    def handle(self, *args, **options):
+        count = recount_tags()
+        self.stdout.write(self.style.SUCCESS('Обновлено тегов: %d' % count))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from webapp.cache import SEARCH_COMMENTS, bump_search_generation
+from webapp.counters import recount_comments
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает количество комментариев и время последнего комментария у статей'
+
+    def handle(self, *args, **options):
+        count = recount_comments()
+        bump_search_generation(SEARCH_COMMENTS)
+        self.stdout.write(self.style.SUCCESS('Обновлено статей: %d' % count))
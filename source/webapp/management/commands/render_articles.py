@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from webapp.cache import bump_page_cache_generation, invalidate_all_article_rows
+from webapp.models import Article
+from webapp.text import render_articles
+
+
+class Command(BaseCommand):
+    help = 'Заново заполняет анонсы (excerpt) и HTML текста (body_html) статей пачками'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--missing', action='store_true', help='Только статьи без body_html')
+
+    def handle(self, *args, **options):
+        count = render_articles(Article, batch_size=options['batch_size'], only_missing=options['missing'])
+        # bulk_update не меняет updated_at, поэтому закешированные строки и страницы сбрасываются явно.
+        if count:
+            invalidate_all_article_rows()
+            bump_page_cache_generation()
+        self.stdout.write(self.style.SUCCESS('Обработано статей: %d' % count))
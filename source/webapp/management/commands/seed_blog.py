@@ -0,0 +1,97 @@
+import random
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+
+from webapp.management.commands._blog_io import Progress, keep_timestamps, rebuild_derived
+from webapp.models import Article, Category, Comment
+from webapp.tags import resolve_tags
+from webapp.text import text_fields
+
+WORDS = ('python django blog article comment search index cache query page tag '
+         'database sqlite server request response template view model form '
+         'питон блог статья комментарий поиск кеш запрос страница шаблон').split()
+AUTHORS = ['Author %d' % i for i in range(50)]
+
+
+def zipf_weights(count, skew):
+    return [1 / (rank ** skew) for rank in range(1, count + 1)]
+
+
+class Command(BaseCommand):
+    help = 'Генерирует воспроизводимый синтетический корпус статей, тегов и комментариев'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--articles', type=int, default=1000)
+        parser.add_argument('--tags', type=int, default=200, help='Размер словаря тегов')
+        parser.add_argument('--tags-per-article', type=int, default=3)
+        parser.add_argument('--comments-per-article', type=float, default=5, help='Среднее число комментариев')
+        parser.add_argument('--categories', type=int, default=10)
+        parser.add_argument('--skew', type=float, default=1.1,
+                            help='Показатель Zipf для популярности тегов и статей (0 - равномерно)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        rng = random.Random(options['seed'])
+        batch_size = options['batch_size']
+        progress = Progress(self.stderr, 100000)
+        now = timezone.now()
+
+        categories = [Category.objects.get_or_create(name='Category %d' % i)[0] for i in range(options['categories'])]
+        tags = resolve_tags(['tag%d' % i for i in range(options['tags'])])
+        tag_weights = zipf_weights(len(tags), options['skew'])
+
+        first_id = (Article.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+        article_ids = list(range(first_id, first_id + options['articles']))
+        Through = Article.tags.through
+        with keep_timestamps(Article, Comment):
+            for start in range(0, len(article_ids), batch_size):
+                articles, links = [], []
+                for pk in article_ids[start:start + batch_size]:
+                    created_at = now - timedelta(seconds=rng.randint(0, 365 * 24 * 3600))
+                    title = ' '.join(rng.choices(WORDS, k=rng.randint(2, 6))).capitalize()
+                    text = ' '.join(rng.choices(WORDS, k=rng.randint(20, 300)))[:3000]
+                    articles.append(Article(
+                        id=pk,
+                        title=title,
+                        text=text,
+                        author=rng.choice(AUTHORS),
+                        category=rng.choice(categories),
+                        created_at=created_at,
+                        updated_at=created_at,
+                        **text_fields(text)
+                    ))
+                    chosen = {tag.pk for tag in rng.choices(tags, weights=tag_weights, k=options['tags_per_article'])}
+                    links.extend(Through(article_id=pk, tag_id=tag_id) for tag_id in chosen)
+                with transaction.atomic():
+                    Article.objects.bulk_create(articles)
+                    Through.objects.bulk_create(links)
+                progress.add('article', len(articles))
+
+            # Комментарии распределены по статьям по Zipf: немногие статьи собирают большую часть.
+            total = int(len(article_ids) * options['comments_per_article'])
+            popular = article_ids[:]
+            rng.shuffle(popular)
+            targets = rng.choices(popular, weights=zipf_weights(len(popular), options['skew']), k=total)
+            for start in range(0, total, batch_size):
+                comments = []
+                for article_id in targets[start:start + batch_size]:
+                    created_at = now - timedelta(seconds=rng.randint(0, 30 * 24 * 3600))
+                    comments.append(Comment(
+                        article_id=article_id,
+                        text=' '.join(rng.choices(WORDS, k=rng.randint(3, 40)))[:400],
+                        author=rng.choice(AUTHORS),
+                        created_at=created_at,
+                        updated_at=created_at,
+                    ))
+                with transaction.atomic():
+                    Comment.objects.bulk_create(comments)
+                progress.add('comment', len(comments))
+
+        self.stderr.write(self.style.SUCCESS('Создано: %s' % progress.summary()))
+        self.stderr.write('Перестраиваем поисковый индекс и счётчики...')
+        rebuild_derived()
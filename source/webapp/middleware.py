@@ -0,0 +1,93 @@
+import json
+import logging
+import random
+import threading
+import time
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+
+logger = logging.getLogger('webapp.requests')
+slow_query_logger = logging.getLogger('webapp.slow_queries')
+
+_state = threading.local()
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.queries = 0
+        self.db_ms = 0.0
+        self.render_ms = 0.0
+        self.render_depth = 0
+        self.slow_queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            self.queries += 1
+            self.db_ms += duration
+            if duration >= settings.SLOW_QUERY_MS:
+                self.slow_queries.append((sql, duration))
+
+
+@contextmanager
+def timed_render():
+    """Учитывает время рендеринга шаблона; вложенные рендеры (include, render_to_string) не суммируются."""
+    metrics = getattr(_state, 'metrics', None)
+    if metrics is None:
+        yield
+        return
+    metrics.render_depth += 1
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.render_depth -= 1
+        if not metrics.render_depth:
+            metrics.render_ms += (time.perf_counter() - started) * 1000
+
+
+class RequestMetricsMiddleware:
+    """
+    Для каждого запроса: имя URL, общее время, число и время SQL-запросов,
+    время рендеринга шаблонов и размер ответа. Отдаёт заголовок Server-Timing,
+    пишет строку JSON в лог webapp.requests и выборочно - медленные запросы
+    в webapp.slow_queries.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        metrics = _state.metrics = RequestMetrics()
+        started = time.perf_counter()
+        try:
+            with connection.execute_wrapper(metrics):
+                response = self.get_response(request)
+        finally:
+            _state.metrics = None
+        total_ms = (time.perf_counter() - started) * 1000
+
+        view = request.resolver_match.view_name if request.resolver_match else None
+        size = None if response.streaming else len(response.content)
+        response['Server-Timing'] = 'db;dur=%.1f;desc="%d queries", tpl;dur=%.1f, total;dur=%.1f' % (
+            metrics.db_ms, metrics.queries, metrics.render_ms, total_ms)
+        logger.info(json.dumps({
+            'view': view,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'total_ms': round(total_ms, 2),
+            'db_queries': metrics.queries,
+            'db_ms': round(metrics.db_ms, 2),
+            'render_ms': round(metrics.render_ms, 2),
+            'size': size,
+        }))
+        for sql, duration in metrics.slow_queries:
+            if random.random() < settings.SLOW_QUERY_SAMPLE_RATE:
+                slow_query_logger.warning(json.dumps({'view': view, 'duration_ms': round(duration, 2), 'sql': sql}))
+        return response
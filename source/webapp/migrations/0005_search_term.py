@@ -0,0 +1,28 @@
+# Generated by Django 2.2.5 on 2026-10-18 11:40
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0004_auto_20191015_2012'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SearchTerm',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('field', models.CharField(choices=[('title', 'Заголовок'), ('text', 'Текст'), ('tags', 'Теги'), ('comments', 'Комментарии')], max_length=10, verbose_name='Поле')),
+                ('term', models.CharField(max_length=64, verbose_name='Терм')),
+                ('weight', models.PositiveIntegerField(default=1, verbose_name='Вес')),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='search_terms', to='webapp.Article', verbose_name='Статья')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='searchterm',
+            index=models.Index(fields=['term', 'field'], name='webapp_sear_term_978c05_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 2.2.5 on 2026-10-18 11:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0005_search_term'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['-created_at', '-id'], name='webapp_comm_created_14d33e_idx'),
+        ),
+    ]
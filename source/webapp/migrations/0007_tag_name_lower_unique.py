@@ -0,0 +1,37 @@
+import string
+from collections import defaultdict
+
+from django.db import migrations
+
+ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+
+
+def merge_case_duplicates(apps, schema_editor):
+    Tag = apps.get_model('webapp', 'Tag')
+    Through = apps.get_model('webapp', 'Article').tags.through
+    groups = defaultdict(list)
+    for pk, name in Tag.objects.order_by('pk').values_list('pk', 'name'):
+        groups[name.translate(ASCII_LOWER)].append(pk)
+    for ids in groups.values():
+        if len(ids) < 2:
+            continue
+        keep, duplicates = ids[0], ids[1:]
+        linked = set(Through.objects.filter(tag_id=keep).values_list('article_id', flat=True))
+        moved = set(Through.objects.filter(tag_id__in=duplicates).values_list('article_id', flat=True)) - linked
+        Through.objects.bulk_create([Through(article_id=article_id, tag_id=keep) for article_id in moved])
+        Tag.objects.filter(pk__in=duplicates).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0006_comment_created_at_index'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_case_duplicates, migrations.RunPython.noop),
+        migrations.RunSQL(
+            'CREATE UNIQUE INDEX webapp_tag_name_lower_uniq ON webapp_tag (LOWER(name))',
+            'DROP INDEX webapp_tag_name_lower_uniq',
+        ),
+    ]
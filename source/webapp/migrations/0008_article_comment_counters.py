@@ -0,0 +1,44 @@
+# Generated by Django 2.2.5 on 2026-10-18 11:45
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_comment_counters(apps, schema_editor):
+    Article = apps.get_model('webapp', 'Article')
+    Comment = apps.get_model('webapp', 'Comment')
+    comments = Comment.objects.filter(article=OuterRef('pk')).order_by()
+    Article.objects.update(
+        comments_count=Coalesce(Subquery(comments.values('article').annotate(count=Count('pk')).values('count')), 0),
+        last_commented_at=Subquery(comments.order_by('-created_at').values('created_at')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0007_tag_name_lower_unique'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='comments_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='last_commented_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True, verbose_name='Время последнего комментария'),
+        ),
+        migrations.RunPython(fill_comment_counters, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['-comments_count', '-id'], name='webapp_arti_comment_be1558_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['-last_commented_at', '-id'], name='webapp_arti_last_co_3a9519_idx'),
+        ),
+    ]
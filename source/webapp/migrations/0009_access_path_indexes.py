@@ -0,0 +1,38 @@
+# Generated by Django 2.2.5 on 2026-10-18 11:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0008_article_comment_counters'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['-created_at', '-id'], name='webapp_arti_created_3805f2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['updated_at'], name='webapp_arti_updated_ea1dcc_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['article', '-created_at'], name='webapp_comm_article_e12324_idx'),
+        ),
+        # iexact в SQLite компилируется в LIKE, который использует только индексы с COLLATE NOCASE.
+        migrations.RunSQL(
+            'CREATE INDEX webapp_article_author_nocase ON webapp_article (author COLLATE NOCASE)',
+            'DROP INDEX webapp_article_author_nocase',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX webapp_comment_author_nocase ON webapp_comment (author COLLATE NOCASE)',
+            'DROP INDEX webapp_comment_author_nocase',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX webapp_tag_name_nocase ON webapp_tag (name COLLATE NOCASE)',
+            'DROP INDEX webapp_tag_name_nocase',
+        ),
+    ]
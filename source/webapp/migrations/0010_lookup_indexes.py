@@ -0,0 +1,20 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0009_access_path_indexes'),
+    ]
+
+    # istartswith в SQLite - это LIKE 'x%', он использует только индексы с COLLATE NOCASE.
+    operations = [
+        migrations.RunSQL(
+            'CREATE INDEX webapp_article_title_nocase ON webapp_article (title COLLATE NOCASE)',
+            'DROP INDEX webapp_article_title_nocase',
+        ),
+        migrations.RunSQL(
+            'CREATE INDEX webapp_category_name_nocase ON webapp_category (name COLLATE NOCASE)',
+            'DROP INDEX webapp_category_name_nocase',
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 2.2.5 on 2026-10-18 12:03
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+from django.db.models.functions import Lower
+import django.db.models.deletion
+
+
+def fill_tag_stats(apps, schema_editor):
+    Tag = apps.get_model('webapp', 'Tag')
+    TagStats = apps.get_model('webapp', 'TagStats')
+    tags = Tag.objects.annotate(
+        name_lower=Lower('name'), articles_count=Count('articles'), last_used_at=Max('articles__created_at'),
+    )
+    TagStats.objects.bulk_create([
+        TagStats(tag_id=tag.pk, name=tag.name_lower, articles_count=tag.articles_count,
+                 last_used_at=tag.last_used_at)
+        for tag in tags
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0010_lookup_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TagStats',
+            fields=[
+                ('tag', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='webapp.Tag', verbose_name='Тег')),
+                ('name', models.CharField(max_length=31, verbose_name='Нормализованное имя')),
+                ('articles_count', models.PositiveIntegerField(default=0, verbose_name='Количество статей')),
+                ('last_used_at', models.DateTimeField(blank=True, null=True, verbose_name='Время последней статьи с тегом')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='tagstats',
+            index=models.Index(fields=['-articles_count', 'name'], name='webapp_tags_article_8e8891_idx'),
+        ),
+        migrations.RunPython(fill_tag_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,86 @@
+# Generated by Django 2.2.5 on 2026-10-18 12:05
+
+from collections import defaultdict
+
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def tag_slug(name):
+    return ' '.join(name.split()).casefold()
+
+
+def fill_slugs(apps, schema_editor):
+    """
+    0007 объединила только дубликаты, отличающиеся регистром ASCII (так работает LOWER в SQLite).
+    slug сравнивает без регистра любые буквы и схлопывает пробелы, поэтому дубликаты объединяются ещё раз:
+    связи переносятся на тег с меньшим pk одним bulk_create, лишние связи и теги удаляются запросами по списку.
+    """
+    Tag = apps.get_model('webapp', 'Tag')
+    TagStats = apps.get_model('webapp', 'TagStats')
+    Through = apps.get_model('webapp', 'Article').tags.through
+    groups = defaultdict(list)
+    for pk, name in Tag.objects.order_by('pk').values_list('pk', 'name'):
+        groups[tag_slug(name)].append(pk)
+
+    keep_for = {}
+    for ids in groups.values():
+        for duplicate in ids[1:]:
+            keep_for[duplicate] = ids[0]
+    if keep_for:
+        linked = set(Through.objects.filter(tag_id__in=set(keep_for.values())).values_list('article_id', 'tag_id'))
+        moved = {
+            (article_id, keep_for[tag_id])
+            for article_id, tag_id in Through.objects.filter(tag_id__in=list(keep_for)).values_list('article_id', 'tag_id')
+        } - linked
+        Through.objects.bulk_create([Through(article_id=article_id, tag_id=tag_id) for article_id, tag_id in moved],
+                                    batch_size=500)
+        Through.objects.filter(tag_id__in=list(keep_for)).delete()
+        TagStats.objects.filter(tag_id__in=list(keep_for)).delete()
+        Tag.objects.filter(pk__in=list(keep_for)).delete()
+
+    for slug, ids in groups.items():
+        Tag.objects.filter(pk=ids[0]).update(slug=slug)
+
+    TagStats.objects.all().delete()
+    tags = Tag.objects.annotate(articles_count=Count('articles'), last_used_at=Max('articles__created_at'))
+    TagStats.objects.bulk_create([
+        TagStats(tag_id=tag.pk, name=tag.slug, articles_count=tag.articles_count, last_used_at=tag.last_used_at)
+        for tag in tags
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0011_tag_stats'),
+    ]
+
+    operations = [
+        # Уникальность и фильтрацию теперь обслуживает индекс по slug. Индексы удаляются до AddField:
+        # SQLite пересоздаёт таблицу при изменении полей и индексы, созданные через RunSQL, всё равно теряются.
+        migrations.RunSQL(
+            'DROP INDEX IF EXISTS webapp_tag_name_lower_uniq',
+            'CREATE UNIQUE INDEX webapp_tag_name_lower_uniq ON webapp_tag (LOWER(name))',
+        ),
+        migrations.RunSQL(
+            'DROP INDEX IF EXISTS webapp_tag_name_nocase',
+            'CREATE INDEX webapp_tag_name_nocase ON webapp_tag (name COLLATE NOCASE)',
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='slug',
+            field=models.CharField(editable=False, max_length=100, null=True, verbose_name='Нормализованное имя'),
+        ),
+        migrations.RunPython(fill_slugs, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='slug',
+            field=models.CharField(editable=False, max_length=100, unique=True, verbose_name='Нормализованное имя'),
+        ),
+        migrations.AlterField(
+            model_name='tagstats',
+            name='name',
+            field=models.CharField(max_length=100, verbose_name='Нормализованное имя'),
+        ),
+    ]
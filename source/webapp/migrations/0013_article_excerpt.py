@@ -0,0 +1,39 @@
+# Generated by Django 2.2.5 on 2026-10-18 12:07
+
+from django.db import migrations, models
+
+from webapp.text import render_articles
+
+# SQLite выполняет AddField пересозданием таблицы, и индексы из RunSQL (миграции 0009 и 0010) пропадают.
+NOCASE_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS webapp_article_author_nocase ON webapp_article (author COLLATE NOCASE)',
+    'CREATE INDEX IF NOT EXISTS webapp_article_title_nocase ON webapp_article (title COLLATE NOCASE)',
+)
+
+
+def fill_article_text(apps, schema_editor):
+    render_articles(apps.get_model('webapp', 'Article'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0012_tag_slug'),
+    ]
+
+    operations = [
+        # При откате RemoveField тоже пересоздаёт таблицу, индексы восстанавливаются последней операцией.
+        migrations.RunSQL(migrations.RunSQL.noop, NOCASE_INDEXES),
+        migrations.AddField(
+            model_name='article',
+            name='body_html',
+            field=models.TextField(blank=True, editable=False, verbose_name='Текст в HTML'),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='excerpt',
+            field=models.CharField(blank=True, editable=False, max_length=200, verbose_name='Анонс'),
+        ),
+        migrations.RunPython(fill_article_text, migrations.RunPython.noop),
+        migrations.RunSQL(NOCASE_INDEXES, migrations.RunSQL.noop),
+    ]
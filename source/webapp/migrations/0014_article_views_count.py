@@ -0,0 +1,30 @@
+# Generated by Django 2.2.5 on 2026-10-18 12:09
+
+from django.db import migrations, models
+
+# AddField в SQLite пересоздаёт таблицу и теряет индексы из RunSQL, см. 0013_article_excerpt.
+NOCASE_INDEXES = (
+    'CREATE INDEX IF NOT EXISTS webapp_article_author_nocase ON webapp_article (author COLLATE NOCASE)',
+    'CREATE INDEX IF NOT EXISTS webapp_article_title_nocase ON webapp_article (title COLLATE NOCASE)',
+)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0013_article_excerpt'),
+    ]
+
+    operations = [
+        migrations.RunSQL(migrations.RunSQL.noop, NOCASE_INDEXES),
+        migrations.AddField(
+            model_name='article',
+            name='views_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество просмотров'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['-views_count', '-id'], name='webapp_arti_views_c_18acf3_idx'),
+        ),
+        migrations.RunSQL(NOCASE_INDEXES, migrations.RunSQL.noop),
+    ]
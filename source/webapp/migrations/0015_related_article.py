@@ -0,0 +1,40 @@
+# Generated by Django 2.2.5 on 2026-10-18 12:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+from webapp.related import related_links
+
+
+def fill_related(apps, schema_editor):
+    Through = apps.get_model('webapp', 'Article').tags.through
+    RelatedArticle = apps.get_model('webapp', 'RelatedArticle')
+    for batch in related_links(Through.objects.values_list('article_id', 'tag_id').iterator(), limit=5, batch_size=500):
+        RelatedArticle.objects.bulk_create([
+            RelatedArticle(article_id=article_id, related_id=related_id, score=score, rank=rank)
+            for article_id, related_id, score, rank in batch
+        ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('webapp', '0014_article_views_count'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RelatedArticle',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField(verbose_name='Сходство')),
+                ('rank', models.PositiveSmallIntegerField(verbose_name='Место')),
+                ('article', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_links', to='webapp.Article', verbose_name='Статья')),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='related_from', to='webapp.Article', verbose_name='Похожая статья')),
+            ],
+            options={
+                'unique_together': {('article', 'rank')},
+            },
+        ),
+        migrations.RunPython(fill_related, migrations.RunPython.noop),
+    ]
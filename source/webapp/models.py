@@ -1,7 +1,26 @@
 from django.db import models
 
+from webapp.text import EXCERPT_LENGTH, text_fields
+
 
 class Article(models.Model):
+    ORDER_NEW = 'new'
+    ORDER_COMMENTS = 'comments'
+    ORDER_ACTIVITY = 'activity'
+    ORDER_VIEWS = 'views'
+    ORDER_CHOICES = (
+        (ORDER_NEW, 'Сначала новые'),
+        (ORDER_COMMENTS, 'По количеству комментариев'),
+        (ORDER_ACTIVITY, 'По последнему комментарию'),
+        (ORDER_VIEWS, 'Самые читаемые'),
+    )
+    ORDERINGS = {
+        ORDER_NEW: ('-created_at', '-id'),
+        ORDER_COMMENTS: ('-comments_count', '-id'),
+        ORDER_ACTIVITY: ('-last_commented_at', '-id'),
+        ORDER_VIEWS: ('-views_count', '-id'),
+    }
+
     title = models.CharField(max_length=200, null=False, blank=False, verbose_name='Заголовок')
     text = models.TextField(max_length=3000, null=False, blank=False, verbose_name='Текст')
     author = models.CharField(max_length=40, null=False, blank=False, default='Unknown', verbose_name='Автор')
@@ -10,6 +29,29 @@ class Article(models.Model):
     category = models.ForeignKey('Category', on_delete=models.PROTECT, null=True, blank=True, verbose_name='Категория',
                                  related_name='articles')
     tags = models.ManyToManyField('webapp.Tag', related_name='articles', blank=True, verbose_name='Теги')
+    comments_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество комментариев')
+    last_commented_at = models.DateTimeField(null=True, blank=True, editable=False,
+                                             verbose_name='Время последнего комментария')
+    # Копится в памяти и записывается пачками (webapp.view_counter), поэтому отстаёт на VIEW_COUNTER_FLUSH_INTERVAL.
+    views_count = models.PositiveIntegerField(default=0, editable=False, verbose_name='Количество просмотров')
+    # Производные от text, заполняются в save(); массовые пути (bulk_create) передают их сами через text_fields.
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, editable=False, verbose_name='Анонс')
+    body_html = models.TextField(blank=True, editable=False, verbose_name='Текст в HTML')
+
+    class Meta:
+        # Поиск по автору (author__iexact) обслуживает индекс webapp_article_author_nocase (миграция 0009).
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['updated_at']),
+            models.Index(fields=['-comments_count', '-id']),
+            models.Index(fields=['-last_commented_at', '-id']),
+            models.Index(fields=['-views_count', '-id']),
+        ]
+
+    def save(self, *args, **kwargs):
+        for name, value in text_fields(self.text).items():
+            setattr(self, name, value)
+        super().save(*args, **kwargs)
 
     def __str__(self):
         return self.title
@@ -22,14 +64,60 @@ class Category(models.Model):
         return self.name
 
 
+def tag_slug(name):
+    """Нормализованное имя тега: без различия регистра (включая не-ASCII) и лишних пробелов."""
+    return ' '.join(name.split()).casefold()
+
+
 class Tag(models.Model):
+    # Теги ищутся и фильтруются только по slug: равенство по уникальному индексу вместо LIKE.
     name = models.CharField(max_length=31, verbose_name='Тег')
+    slug = models.CharField(max_length=100, unique=True, editable=False, verbose_name='Нормализованное имя')
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Время создания')
 
+    def save(self, *args, **kwargs):
+        self.slug = tag_slug(self.name)
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return self.name
 
 
+class TagStats(models.Model):
+    # Материализованная статистика тегов, поддерживается сигналами m2m_changed (webapp.counters),
+    # пересобирается командой rebuild_tag_stats.
+    tag = models.OneToOneField('webapp.Tag', primary_key=True, related_name='stats',
+                               on_delete=models.CASCADE, verbose_name='Тег')
+    name = models.CharField(max_length=100, verbose_name='Нормализованное имя')
+    articles_count = models.PositiveIntegerField(default=0, verbose_name='Количество статей')
+    last_used_at = models.DateTimeField(null=True, blank=True, verbose_name='Время последней статьи с тегом')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-articles_count', 'name']),
+        ]
+
+    def __str__(self):
+        return self.name
+
+
+class RelatedArticle(models.Model):
+    # Похожие статьи по общим тегам (коэффициент Жаккара), считаются в webapp.related.
+    # rank - место в списке статьи, страница статьи читает список по уникальному индексу (article, rank).
+    article = models.ForeignKey('webapp.Article', related_name='related_links',
+                                on_delete=models.CASCADE, verbose_name='Статья')
+    related = models.ForeignKey('webapp.Article', related_name='related_from',
+                                on_delete=models.CASCADE, verbose_name='Похожая статья')
+    score = models.FloatField(verbose_name='Сходство')
+    rank = models.PositiveSmallIntegerField(verbose_name='Место')
+
+    class Meta:
+        unique_together = ('article', 'rank')
+
+    def __str__(self):
+        return '%s -> %s' % (self.article_id, self.related_id)
+
+
 class Comment(models.Model):
     article = models.ForeignKey('webapp.Article', related_name='comments',
                                 on_delete=models.CASCADE, verbose_name='Статья')
@@ -38,5 +126,39 @@ class Comment(models.Model):
     created_at = models.DateTimeField(auto_now_add=True, verbose_name='Время создания')
     updated_at = models.DateTimeField(auto_now=True, verbose_name='Время изменения')
 
+    class Meta:
+        # Поиск по автору (author__iexact) обслуживает индекс webapp_comment_author_nocase (миграция 0009).
+        indexes = [
+            models.Index(fields=['-created_at', '-id']),
+            models.Index(fields=['article', '-created_at']),
+        ]
+
     def __str__(self):
         return self.text[:20]
+
+
+class SearchTerm(models.Model):
+    FIELD_TITLE = 'title'
+    FIELD_TEXT = 'text'
+    FIELD_TAGS = 'tags'
+    FIELD_COMMENTS = 'comments'
+    FIELD_CHOICES = (
+        (FIELD_TITLE, 'Заголовок'),
+        (FIELD_TEXT, 'Текст'),
+        (FIELD_TAGS, 'Теги'),
+        (FIELD_COMMENTS, 'Комментарии'),
+    )
+
+    article = models.ForeignKey('webapp.Article', related_name='search_terms',
+                                on_delete=models.CASCADE, verbose_name='Статья')
+    field = models.CharField(max_length=10, choices=FIELD_CHOICES, verbose_name='Поле')
+    term = models.CharField(max_length=64, verbose_name='Терм')
+    weight = models.PositiveIntegerField(default=1, verbose_name='Вес')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['term', 'field']),
+        ]
+
+    def __str__(self):
+        return self.term
@@ -0,0 +1,116 @@
+import base64
+import binascii
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def cached_count(queryset, timeout=None):
+    """COUNT(*) запроса, закешированный на PAGINATOR_COUNT_CACHE_TIMEOUT секунд."""
+    if timeout is None:
+        timeout = settings.PAGINATOR_COUNT_CACHE_TIMEOUT
+    key = 'paginator_count:%s' % hashlib.md5(str(queryset.query).encode()).hexdigest()
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, timeout)
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return cached_count(self.object_list)
+
+
+class KeysetPage:
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class KeysetPaginator:
+    """
+    Пагинация по ключу сортировки (например ('-created_at', '-id')) вместо OFFSET.
+    Курсор хранит ключ крайней строки страницы, поэтому любая страница стоит
+    один запрос по индексу и не требует COUNT(*).
+    """
+
+    def __init__(self, queryset, per_page, ordering=('-created_at', '-id')):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.descending = ordering[0].startswith('-')
+        self.fields = [name.lstrip('-') for name in ordering]
+        self.ordering = list(ordering)
+        self.reversed_ordering = [name[1:] if self.descending else '-' + name for name in ordering]
+
+    def encode_cursor(self, obj, direction):
+        values = [getattr(obj, name) for name in self.fields]
+        values = [value.isoformat() if hasattr(value, 'isoformat') else value for value in values]
+        data = json.dumps([direction, values], separators=(',', ':')).encode()
+        return base64.urlsafe_b64encode(data).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        try:
+            data = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            direction, values = json.loads(data.decode())
+            if direction not in ('next', 'prev') or len(values) != len(self.fields):
+                raise InvalidCursor(cursor)
+            model = self.queryset.model
+            values = [model._meta.get_field(name).to_python(value) for name, value in zip(self.fields, values)]
+        except (binascii.Error, UnicodeDecodeError, ValueError, TypeError) as e:
+            raise InvalidCursor(cursor) from e
+        return direction, values
+
+    def get_filter(self, values, backwards=False):
+        lookup = 'lt' if self.descending != backwards else 'gt'
+        first, second = self.fields
+        # Условие по первому полю отдельно, чтобы СУБД могла сделать range scan по индексу.
+        return Q(**{'%s__%se' % (first, lookup): values[0]}) & (
+            Q(**{'%s__%s' % (first, lookup): values[0]}) | Q(**{'%s__%s' % (second, lookup): values[1]})
+        )
+
+    def get_page(self, cursor=None):
+        direction, values = self.decode_cursor(cursor) if cursor else ('next', None)
+        backwards = direction == 'prev'
+        queryset = self.queryset.order_by(*(self.reversed_ordering if backwards else self.ordering))
+        if values is not None:
+            queryset = queryset.filter(self.get_filter(values, backwards))
+        rows = list(queryset[:self.per_page + 1])
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            rows.reverse()
+        has_next = has_more if not backwards else values is not None
+        has_previous = has_more if backwards else values is not None
+        page = KeysetPage(rows)
+        if rows and has_next:
+            page.next_cursor = self.encode_cursor(rows[-1], 'next')
+        if rows and has_previous:
+            page.previous_cursor = self.encode_cursor(rows[0], 'prev')
+        return page
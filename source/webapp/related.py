@@ -0,0 +1,235 @@
+import logging
+import threading
+
+import numpy as np
+from django.conf import settings
+from django.db import transaction
+from scipy import sparse
+
+from webapp.cache import bump_page_cache_generation, invalidate_article_rows
+from webapp.db import write_atomic
+from webapp.models import Article, RelatedArticle
+
+logger = logging.getLogger('webapp.related')
+
+_pending = threading.local()
+
+
+def tag_matrix(links):
+    """Разреженная матрица статьи × теги по парам (article_id, tag_id) и pk статей по строкам."""
+    links = np.fromiter((value for link in links for value in link), dtype=np.int64).reshape(-1, 2)
+    article_ids, rows = np.unique(links[:, 0], return_inverse=True)
+    tag_ids, columns = np.unique(links[:, 1], return_inverse=True)
+    matrix = sparse.csr_matrix((np.ones(len(links), dtype=np.int32), (rows, columns)),
+                               shape=(len(article_ids), len(tag_ids)))
+    return article_ids, matrix
+
+
+def similarity(matrix, sizes, rows):
+    """Коэффициент Жаккара строк rows со всеми строками матрицы: (строка, другая строка, оценка) без пар с собой."""
+    overlap = (matrix[rows] @ matrix.T).tocoo()
+    source, target, shared = rows[overlap.row], overlap.col, overlap.data
+    other = source != target
+    source, target, shared = source[other], target[other], shared[other]
+    return source, target, shared / (sizes[source] + sizes[target] - shared)
+
+
+def top_ranked(source, target, scores, limit):
+    """Первые limit пар каждой строки: (строка, сосед, оценка, место) массивами."""
+    # Внутри строки по убыванию оценки, при равенстве сначала более новые статьи (больший pk).
+    order = np.lexsort((-target, -scores, source))
+    source, target, scores = source[order], target[order], scores[order]
+    ranks = np.arange(len(source)) - np.searchsorted(source, source)
+    top = ranks < limit
+    return source[top], target[top], scores[top], ranks[top]
+
+
+def nearest(matrix, sizes, rows, limit):
+    """До limit соседей для строк rows; общие теги считаются одним умножением пачки строк на всю матрицу."""
+    return top_ranked(*similarity(matrix, sizes, rows), limit)
+
+
+def related_links(links, article_ids=None, limit=None, batch_size=None):
+    """
+    Пачки кортежей (article_id, related_id, score, rank) для статей article_ids (None - для всех из links).
+    links должны содержать все теги каждой статьи, которая может попасть в похожие.
+    """
+    limit = limit or settings.RELATED_ARTICLES_COUNT
+    batch_size = batch_size or settings.RELATED_ARTICLES_BATCH_SIZE
+    ids, matrix = tag_matrix(links)
+    sizes = np.diff(matrix.indptr)
+    rows = np.arange(len(ids)) if article_ids is None else np.flatnonzero(np.isin(ids, list(article_ids)))
+    for start in range(0, len(rows), batch_size):
+        source, target, scores, ranks = nearest(matrix, sizes, rows[start:start + batch_size], limit)
+        yield list(zip(ids[source].tolist(), ids[target].tolist(), scores.tolist(), ranks.tolist()))
+
+
+def save_related(batches):
+    count = 0
+    for batch in batches:
+        RelatedArticle.objects.bulk_create([
+            RelatedArticle(article_id=article_id, related_id=related_id, score=score, rank=rank)
+            for article_id, related_id, score, rank in batch
+        ])
+        count += len(batch)
+    return count
+
+
+def rebuild_related(batch_size=None):
+    """Пересобирает таблицу похожих статей целиком, возвращает число связей."""
+    links = Article.tags.through.objects.values_list('article_id', 'tag_id')
+    with transaction.atomic():
+        RelatedArticle.objects.all().delete()
+        return save_related(related_links(links.iterator(), batch_size=batch_size))
+
+
+def sharing_tags(article_ids):
+    """Подзапрос pk статей, у которых есть общий тег с article_ids."""
+    Through = Article.tags.through
+    return Through.objects.filter(tag__in=Through.objects.filter(article__in=article_ids).values('tag')) \
+        .values('article')
+
+
+def candidate_links(article_ids):
+    """Связи статей, которые могут попасть в похожие для article_ids, со всеми их тегами."""
+    return Article.tags.through.objects.filter(article__in=sharing_tags(article_ids)) \
+        .values_list('article_id', 'tag_id')
+
+
+def chunks(items, size):
+    items = list(items)
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def stored_lists(article_ids):
+    """Сохранённые списки похожих: {article_id: [(related_id, score), ...]} в порядке rank."""
+    lists = {}
+    for chunk in chunks(article_ids, settings.RELATED_ARTICLES_BATCH_SIZE):
+        rows = RelatedArticle.objects.filter(article__in=chunk).order_by('article', 'rank') \
+            .values_list('article_id', 'related_id', 'score')
+        for article_id, related_id, score in rows:
+            lists.setdefault(article_id, []).append((related_id, score))
+    return lists
+
+
+def merge_list(stored, scores, changed, limit):
+    """
+    Новый список статьи после смены тегов у changed, если его можно получить без полного пересчёта, иначе None.
+    Статьи вне сохранённого полного списка не лучше его последней, поэтому слияние верно,
+    пока новая последняя не хуже старой. Иначе на её место может встать статья, которой в списке нет.
+    """
+    merged = {related_id: score for related_id, score in stored if related_id not in changed}
+    merged.update(scores)
+    ranked = sorted(merged.items(), key=lambda item: (item[1], item[0]), reverse=True)[:limit]
+    if len(stored) >= limit:
+        last_id, last_score = stored[-1]
+        if len(ranked) < limit or (ranked[-1][1], ranked[-1][0]) < (last_score, last_id):
+            return None
+    return ranked
+
+
+def refresh_related(changed_ids, recompute_ids=()):
+    """
+    Обновляет похожие после смены тегов у changed_ids, возвращает pk статей, чьи списки переписаны.
+    Полностью пересчитываются только списки самих changed_ids и recompute_ids. В чужие списки
+    оценки changed_ids вливаются (одно умножение их строк на матрицу кандидатов),
+    а пересчитываются только списки, из которых они выпали.
+    Рассчитано на пачку до RELATED_ARTICLES_BATCH_SIZE статей, большие изменения делит run_scheduled_refresh.
+    """
+    changed = set(changed_ids)
+    limit = settings.RELATED_ARTICLES_COUNT
+    batch_size = settings.RELATED_ARTICLES_BATCH_SIZE
+    lists = {article_id: [] for article_id in changed}
+    scores = {}
+    ids, matrix = tag_matrix(candidate_links(changed))
+    rows = np.flatnonzero(np.isin(ids, list(changed)))
+    if len(rows):
+        pairs = similarity(matrix, np.diff(matrix.indptr), rows)
+        source, target, values, _ = top_ranked(*pairs, limit)
+        for article_id, related_id, score in zip(ids[source].tolist(), ids[target].tolist(), values.tolist()):
+            lists[article_id].append((related_id, score))
+        source, target, values = pairs
+        # В чужой список попадают только оценки выше его последней: остальные merge_list всё равно
+        # отбросит или отправит список на пересчёт, поэтому в Python идут не все пары changed × кандидаты.
+        last_scores = np.full(len(ids), -np.inf)
+        last_ids = np.full(len(ids), -1, dtype=np.int64)
+        for article_id, related_id, score in RelatedArticle.objects \
+                .filter(article__in=sharing_tags(changed), rank=limit - 1) \
+                .values_list('article_id', 'related_id', 'score'):
+            row = np.searchsorted(ids, article_id)
+            if row < len(ids) and ids[row] == article_id:
+                last_scores[row], last_ids[row] = score, related_id
+        source_ids = ids[source]
+        enters = (values > last_scores[target]) | \
+            ((values == last_scores[target]) & (source_ids >= last_ids[target]))
+        enters &= ~np.isin(target, rows)
+        for article_id, other_id, score in zip(source_ids[enters].tolist(), ids[target[enters]].tolist(),
+                                               values[enters].tolist()):
+            scores.setdefault(other_id, {})[article_id] = score
+
+    # Чужие списки, которые меняются: где changed_ids уже были, и где их новая оценка выше последней.
+    listing = set(RelatedArticle.objects.filter(related__in=changed).values_list('article_id', flat=True))
+    entering = set(scores)
+    recompute = set(recompute_ids) - changed
+    merging = (listing | entering) - changed - recompute
+    stored = stored_lists(merging)
+    for other_id in merging:
+        merged = merge_list(stored.get(other_id, []), scores.get(other_id, {}), changed, limit)
+        if merged is None:
+            recompute.add(other_id)
+        elif merged != stored.get(other_id, []):
+            lists[other_id] = merged
+
+    if recompute:
+        lists.update((article_id, []) for article_id in recompute)
+        for batch in related_links(candidate_links(recompute), recompute):
+            for article_id, related_id, score, rank in batch:
+                lists[article_id].append((related_id, score))
+
+    with transaction.atomic():
+        for chunk in chunks(lists, batch_size):
+            RelatedArticle.objects.filter(article__in=chunk).delete()
+        RelatedArticle.objects.bulk_create([
+            RelatedArticle(article_id=article_id, related_id=related_id, score=score, rank=rank)
+            for article_id, related in lists.items() for rank, (related_id, score) in enumerate(related)
+        ], batch_size=batch_size)
+    return set(lists)
+
+
+def schedule_related_refresh(changed_ids=(), recompute_ids=()):
+    """
+    Откладывает refresh_related до конца транзакции. set() тегов шлёт post_remove и post_add,
+    а пересчёт нужен один, и он не должен держать блокировку записи, взятую под изменение статьи.
+    """
+    changed = getattr(_pending, 'changed', set())
+    recompute = getattr(_pending, 'recompute', set())
+    _pending.changed = changed | set(changed_ids)
+    _pending.recompute = recompute | set(recompute_ids)
+    transaction.on_commit(run_scheduled_refresh)
+
+
+def run_scheduled_refresh():
+    """
+    Обновляет похожие пачками по RELATED_ARTICLES_BATCH_SIZE статей, каждая своей транзакцией:
+    снятие популярного тега не держит блокировку записи на всё обновление.
+    Пачка вливает свои оценки в списки, уже согласованные с предыдущими пачками, поэтому
+    результат тот же, что у одного вызова. Списки recompute_ids пересчитываются последними,
+    после всех слияний.
+    """
+    changed, recompute = getattr(_pending, 'changed', set()), getattr(_pending, 'recompute', set())
+    _pending.changed, _pending.recompute = set(), set()
+    if not (changed or recompute):
+        return
+    batch_size = settings.RELATED_ARTICLES_BATCH_SIZE
+    batches = [(batch, ()) for batch in chunks(sorted(changed), batch_size)]
+    batches += [((), batch) for batch in chunks(sorted(recompute - changed), batch_size)]
+    refreshed = set()
+    try:
+        for changed_batch, recompute_batch in batches:
+            refreshed |= write_atomic(refresh_related)(changed_batch, recompute_batch)
+    except Exception:
+        logger.exception('Related articles not refreshed for %s, run rebuild_related', sorted(changed | recompute))
+    if refreshed:
+        invalidate_article_rows(refreshed)
+        bump_page_cache_generation()
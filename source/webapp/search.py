@@ -0,0 +1,131 @@
+import re
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum
+
+from webapp.models import Article, Comment, SearchTerm
+
+TOKEN_RE = re.compile(r'\w+')
+MAX_TERM_LENGTH = 64
+
+ALL_FIELDS = (SearchTerm.FIELD_TITLE, SearchTerm.FIELD_TEXT,
+              SearchTerm.FIELD_TAGS, SearchTerm.FIELD_COMMENTS)
+
+# Совпадение в заголовке или теге важнее, чем в тексте статьи или комментария.
+FIELD_WEIGHTS = {
+    SearchTerm.FIELD_TITLE: 5,
+    SearchTerm.FIELD_TAGS: 3,
+    SearchTerm.FIELD_TEXT: 1,
+    SearchTerm.FIELD_COMMENTS: 1,
+}
+
+
+def tokenize(text):
+    return [token[:MAX_TERM_LENGTH] for token in TOKEN_RE.findall(text.lower())]
+
+
+def reindex_articles(article_ids, fields=ALL_FIELDS):
+    article_ids = set(article_ids)
+    if not article_ids:
+        return
+    documents = defaultdict(lambda: defaultdict(list))
+    if SearchTerm.FIELD_TITLE in fields or SearchTerm.FIELD_TEXT in fields:
+        for pk, title, text in Article.objects.filter(pk__in=article_ids).values_list('pk', 'title', 'text'):
+            documents[pk][SearchTerm.FIELD_TITLE].append(title)
+            documents[pk][SearchTerm.FIELD_TEXT].append(text)
+    if SearchTerm.FIELD_TAGS in fields:
+        links = Article.tags.through.objects.filter(article_id__in=article_ids)
+        for pk, name in links.values_list('article_id', 'tag__name'):
+            documents[pk][SearchTerm.FIELD_TAGS].append(name)
+    if SearchTerm.FIELD_COMMENTS in fields:
+        for pk, text in Comment.objects.filter(article_id__in=article_ids).values_list('article_id', 'text'):
+            documents[pk][SearchTerm.FIELD_COMMENTS].append(text)
+
+    terms = []
+    for pk, texts in documents.items():
+        for field in fields:
+            counts = Counter(tokenize(' '.join(texts[field])))
+            terms.extend(SearchTerm(article_id=pk, field=field, term=term, weight=count * FIELD_WEIGHTS[field])
+                         for term, count in counts.items())
+    with transaction.atomic():
+        SearchTerm.objects.filter(article_id__in=article_ids, field__in=fields).delete()
+        SearchTerm.objects.bulk_create(terms, batch_size=500)
+
+
+def update_comment_terms(added=(), removed=()):
+    """
+    Меняет веса термов поля комментариев на термы добавленных и удалённых комментариев,
+    пары (article_id, text), не перечитывая остальные комментарии статьи.
+    """
+    deltas = defaultdict(Counter)
+    for article_id, text in added:
+        deltas[article_id].update(tokenize(text))
+    for article_id, text in removed:
+        deltas[article_id].subtract(tokenize(text))
+    weight = FIELD_WEIGHTS[SearchTerm.FIELD_COMMENTS]
+    changed, emptied, created = [], [], []
+    for article_id, counts in deltas.items():
+        counts = {term: count for term, count in counts.items() if count}
+        terms = list(counts)
+        for start in range(0, len(terms), 500):
+            stored = SearchTerm.objects.filter(article_id=article_id, field=SearchTerm.FIELD_COMMENTS,
+                                               term__in=terms[start:start + 500])
+            for term in stored:
+                # Индекс мог отстать (массовая запись без сигналов), вес не уходит ниже нуля.
+                term.weight = max(term.weight + counts.pop(term.term) * weight, 0)
+                if term.weight:
+                    changed.append(term)
+                else:
+                    emptied.append(term.pk)
+        created.extend(SearchTerm(article_id=article_id, field=SearchTerm.FIELD_COMMENTS, term=term,
+                                  weight=count * weight)
+                       for term, count in counts.items() if count > 0)
+    with transaction.atomic():
+        SearchTerm.objects.bulk_update(changed, ['weight'], batch_size=500)
+        SearchTerm.objects.filter(pk__in=emptied).delete()
+        SearchTerm.objects.bulk_create(created, batch_size=500)
+
+
+def rebuild_index(batch_size=500):
+    ids = list(Article.objects.order_by('pk').values_list('pk', flat=True))
+    for start in range(0, len(ids), batch_size):
+        reindex_articles(ids[start:start + batch_size])
+    return len(ids)
+
+
+def author_filter(author, in_articles=True, in_comments=True):
+    query = Q(pk__in=[])
+    if in_articles:
+        query |= Q(author__iexact=author)
+    if in_comments:
+        query |= Q(pk__in=Comment.objects.filter(author__iexact=author).values('article_id'))
+    return query
+
+
+def search_articles(text=None, fields=ALL_FIELDS, author=None, in_articles=True, in_comments=True, order=None):
+    """
+    Возвращает queryset из pk статей, отсортированных по релевантности
+    или по одному из Article.ORDERINGS, если передан order.
+    """
+    ordering = Article.ORDERINGS.get(order)
+    articles = Article.objects.all()
+    if author:
+        articles = articles.filter(author_filter(author, in_articles, in_comments))
+    if not text:
+        return articles.order_by(*(ordering or Article.ORDERINGS[Article.ORDER_NEW])).values_list('pk', flat=True)
+
+    terms = set(tokenize(text))
+    if not terms or not fields:
+        return Article.objects.none().values_list('pk', flat=True)
+    matches = SearchTerm.objects.filter(term__in=terms, field__in=fields)
+    if author:
+        matches = matches.filter(article_id__in=articles.values('pk'))
+    if ordering:
+        ordering = [name.replace('-', '-article__', 1) if name.startswith('-') else 'article__' + name
+                    for name in ordering]
+    return matches.values('article_id') \
+        .annotate(score=Sum('weight'), matched=Count('term', distinct=True)) \
+        .filter(matched=len(terms)) \
+        .order_by(*(ordering or ('-score', '-article_id'))) \
+        .values_list('article_id', flat=True)
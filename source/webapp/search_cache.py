@@ -0,0 +1,113 @@
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+
+from webapp.cache import (SEARCH_ARTICLES, SEARCH_COMMENTS, SEARCH_TAGS, SEARCH_VIEWS,
+                          search_generations)
+from webapp.models import Article, SearchTerm
+from webapp.search import ALL_FIELDS, search_articles, tokenize
+
+
+class SearchCache:
+    """
+    Списки pk найденных статей в памяти процесса: не больше SEARCH_CACHE_SIZE запросов
+    с вытеснением давно не использованных, каждый живёт SEARCH_CACHE_TIMEOUT секунд.
+    Запись хранит поколения данных, от которых зависит результат (webapp.cache.search_generations),
+    и устаревает, как только одно из них сменилось. Поколения лежат в общем кеше,
+    поэтому изменение в одном процессе сбрасывает записи во всех.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def get(self, key, generations):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                expires_at, entry_generations, article_ids = entry
+                if expires_at > time.monotonic() and entry_generations == generations:
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    return article_ids
+                del self.entries[key]
+                self.stale += 1
+            self.misses += 1
+            return None
+
+    def set(self, key, generations, article_ids):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + settings.SEARCH_CACHE_TIMEOUT, generations, article_ids)
+            self.entries.move_to_end(key)
+            while len(self.entries) > settings.SEARCH_CACHE_SIZE:
+                self.entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+    def stats(self):
+        requests = self.hits + self.misses
+        return {
+            'size': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'stale': self.stale,
+            'evictions': self.evictions,
+            'hit_rate': round(self.hits / requests, 3) if requests else 0.0,
+        }
+
+
+search_cache = SearchCache()
+
+
+def search_key(text=None, fields=ALL_FIELDS, author=None, in_articles=True, in_comments=True, order=None):
+    """
+    Нормализованный ключ поиска: термы текста без повторов в алфавитном порядке (поиск сравнивает
+    их как множество), автор без учёта регистра (как author__iexact), отсортированные поля
+    и флаги, которые влияют на результат.
+    """
+    terms = tuple(sorted(set(tokenize(text)))) if text else None
+    return (
+        terms,
+        tuple(sorted(fields)) if text else None,
+        author.strip().casefold() if author else None,
+        (bool(in_articles), bool(in_comments)) if author else None,
+        order or None,
+    )
+
+
+def search_dependencies(key):
+    """Виды данных, изменение которых может поменять результат поиска по ключу key."""
+    terms, fields, author, author_flags, order = key
+    kinds = [SEARCH_ARTICLES]
+    if terms and SearchTerm.FIELD_TAGS in fields:
+        kinds.append(SEARCH_TAGS)
+    if (terms and SearchTerm.FIELD_COMMENTS in fields) or (author and author_flags[1]) \
+            or order in (Article.ORDER_COMMENTS, Article.ORDER_ACTIVITY):
+        kinds.append(SEARCH_COMMENTS)
+    if order == Article.ORDER_VIEWS:
+        kinds.append(SEARCH_VIEWS)
+    return kinds
+
+
+def cached_search(**params):
+    """
+    search_articles через кеш процесса: кортеж pk статей и признак попадания в кеш.
+    Поколения читаются до запроса, поэтому запись, изменившая данные во время поиска, сбросит результат.
+    """
+    key = search_key(**params)
+    generations = search_generations(search_dependencies(key))
+    article_ids = search_cache.get(key, generations)
+    if article_ids is not None:
+        return article_ids, True
+    article_ids = tuple(search_articles(**params))
+    search_cache.set(key, generations, article_ids)
+    return article_ids, False
@@ -0,0 +1,146 @@
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.db.models import Max
+from django.db.models.signals import post_save, post_delete, pre_delete, pre_save, m2m_changed
+from django.dispatch import receiver
+
+from webapp.cache import (SEARCH_ARTICLES, SEARCH_COMMENTS, SEARCH_TAGS, bump_page_cache_generation,
+                          bump_search_generation, invalidate_article_rows, invalidate_tag_cloud)
+from webapp.counters import comment_added, comment_removed, recount_comments, recount_tags, tags_attached
+from webapp.models import Article, Comment, RelatedArticle, SearchTerm, Tag
+from webapp.related import schedule_related_refresh
+from webapp.search import reindex_articles, update_comment_terms
+
+
+@receiver(post_save, sender=Article)
+def article_saved(sender, instance, created, **kwargs):
+    reindex_articles([instance.pk], (SearchTerm.FIELD_TITLE, SearchTerm.FIELD_TEXT))
+    article_ids = [instance.pk]
+    if not created:
+        # Заголовок выводится в блоке похожих у других статей, их ETag зависит от версии строки.
+        article_ids += RelatedArticle.objects.filter(related=instance).values_list('article_id', flat=True)
+    invalidate_article_rows(article_ids)
+    bump_page_cache_generation()
+    bump_search_generation(SEARCH_ARTICLES)
+
+
+@receiver(pre_delete, sender=Article)
+def article_deleting(sender, instance, **kwargs):
+    instance._deleted_tag_ids = list(instance.tags.values_list('pk', flat=True))
+    instance._related_from_ids = list(
+        RelatedArticle.objects.filter(related=instance).exclude(article=instance).values_list('article', flat=True)
+    )
+
+
+@receiver(post_delete, sender=Article)
+def article_deleted(sender, instance, **kwargs):
+    if instance._deleted_tag_ids:
+        recount_tags(instance._deleted_tag_ids)
+    # Каскад удалил статью из чужих списков похожих, списки дополняются следующими по сходству.
+    if instance._related_from_ids:
+        schedule_related_refresh(recompute_ids=instance._related_from_ids)
+    invalidate_article_rows([instance.pk])
+    bump_page_cache_generation()
+    bump_search_generation(SEARCH_ARTICLES)
+
+
+@receiver(m2m_changed, sender=Article.tags.through)
+def article_tags_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._cleared_article_ids = list(instance.articles.values_list('pk', flat=True))
+    elif action == 'pre_clear':
+        instance._cleared_tag_ids = list(instance.tags.values_list('pk', flat=True))
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        article_ids = [instance.pk]
+        tag_ids = getattr(instance, '_cleared_tag_ids', []) if action == 'post_clear' else pk_set
+    elif action == 'post_clear':
+        article_ids = getattr(instance, '_cleared_article_ids', [])
+        tag_ids = [instance.pk]
+    else:
+        article_ids = pk_set
+        tag_ids = [instance.pk]
+    if action != 'post_add':
+        recount_tags(tag_ids)
+    elif not reverse:
+        tags_attached(tag_ids, 1, instance.created_at)
+    elif article_ids:
+        newest = Article.objects.filter(pk__in=article_ids).aggregate(newest=Max('created_at'))['newest']
+        tags_attached(tag_ids, len(article_ids), newest)
+    reindex_articles(article_ids, (SearchTerm.FIELD_TAGS,))
+    schedule_related_refresh(article_ids)
+    invalidate_article_rows(article_ids)
+    bump_page_cache_generation()
+    bump_search_generation(SEARCH_TAGS)
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    if not created:
+        recount_tags([instance.pk])
+        article_ids = list(instance.articles.values_list('pk', flat=True))
+        reindex_articles(article_ids, (SearchTerm.FIELD_TAGS,))
+        invalidate_article_rows(article_ids)
+        bump_page_cache_generation()
+        bump_search_generation(SEARCH_TAGS)
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleting(sender, instance, **kwargs):
+    instance._deleted_article_ids = list(instance.articles.values_list('pk', flat=True))
+
+
+@receiver(post_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    invalidate_tag_cloud()
+    reindex_articles(instance._deleted_article_ids, (SearchTerm.FIELD_TAGS,))
+    schedule_related_refresh(instance._deleted_article_ids)
+    invalidate_article_rows(instance._deleted_article_ids)
+    bump_page_cache_generation()
+    bump_search_generation(SEARCH_TAGS)
+
+
+@receiver(pre_save, sender=Comment)
+def comment_saving(sender, instance, **kwargs):
+    # В админке комментарий можно перенести в другую статью, счётчики тогда меняются у обеих.
+    # Прежний текст нужен, чтобы вычесть его термы из индекса.
+    instance._previous = None
+    if instance.pk is not None:
+        instance._previous = Comment.objects.filter(pk=instance.pk).values_list('article_id', 'text').first()
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    previous = instance._previous
+    article_ids = [instance.article_id]
+    if created:
+        comment_added(instance)
+    elif previous is not None and previous[0] != instance.article_id:
+        recount_comments([previous[0], instance.article_id])
+        article_ids.append(previous[0])
+    if previous != (instance.article_id, instance.text):
+        update_comment_terms(added=[(instance.article_id, instance.text)], removed=[previous] if previous else [])
+    comment_changed(article_ids)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    comment_removed(instance)
+    update_comment_terms(removed=[(instance.article_id, instance.text)])
+    comment_changed([instance.article_id])
+
+
+def comment_changed(article_ids):
+    invalidate_article_rows(article_ids)
+    bump_page_cache_generation()
+    bump_search_generation(SEARCH_COMMENTS)
+
+
+@receiver(connection_created)
+def apply_sqlite_pragmas(sender, connection, **kwargs):
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.SQLITE_PRAGMAS.items():
+            cursor.execute('PRAGMA %s = %s' % (name, value))
@@ -0,0 +1,61 @@
+(function () {
+    function setupLookup(select) {
+        var input = document.createElement('input');
+        input.type = 'search';
+        input.className = 'form-control mb-2';
+        input.placeholder = 'Начните вводить...';
+        select.parentNode.insertBefore(input, select);
+
+        var timer = null;
+        var page = 1;
+
+        function load(append) {
+            var url = select.dataset.lookupUrl + '?q=' + encodeURIComponent(input.value) + '&page=' + page;
+            fetch(url).then(function (response) {
+                return response.json();
+            }).then(function (data) {
+                var selected = select.value;
+                Array.prototype.slice.call(select.options).forEach(function (option) {
+                    if (option.dataset.more || (!append && option.value && option.value !== selected)) {
+                        select.removeChild(option);
+                    }
+                });
+                data.results.forEach(function (item) {
+                    if (String(item.id) === selected) {
+                        return;
+                    }
+                    select.appendChild(new Option(item.text, item.id));
+                });
+                if (data.has_next) {
+                    var more = new Option('Ещё...', '');
+                    more.dataset.more = '1';
+                    select.appendChild(more);
+                }
+            });
+        }
+
+        input.addEventListener('input', function () {
+            clearTimeout(timer);
+            timer = setTimeout(function () {
+                page = 1;
+                load(false);
+            }, 250);
+        });
+        select.addEventListener('change', function () {
+            var option = select.options[select.selectedIndex];
+            if (option && option.dataset.more) {
+                page += 1;
+                load(true);
+            }
+        });
+        select.addEventListener('focus', function () {
+            if (select.options.length <= 1) {
+                load(false);
+            }
+        }, {once: true});
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        document.querySelectorAll('select[data-lookup-url]').forEach(setupLookup);
+    });
+})();
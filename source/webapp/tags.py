@@ -0,0 +1,46 @@
+from collections import OrderedDict
+
+from django.db import transaction
+from django.db.models import Count
+
+from webapp.models import Article, Tag, tag_slug
+
+
+def lookup_tags(slugs):
+    return {tag.slug: tag for tag in Tag.objects.filter(slug__in=slugs)}
+
+
+def resolve_tags(names):
+    """Возвращает теги по списку имён, создавая недостающие, за фиксированное число запросов."""
+    wanted = OrderedDict()
+    for name in names:
+        if tag_slug(name):
+            wanted.setdefault(tag_slug(name), name)
+    if not wanted:
+        return []
+    found = lookup_tags(list(wanted))
+    missing = [slug for slug in wanted if slug not in found]
+    if missing:
+        # bulk_create не вызывает Tag.save(), slug заполняется здесь.
+        Tag.objects.bulk_create([Tag(name=wanted[slug], slug=slug) for slug in missing], ignore_conflicts=True)
+        found.update(lookup_tags(missing))
+    return [found[slug] for slug in wanted]
+
+
+def set_article_tags(article, names):
+    with transaction.atomic():
+        article.tags.set(resolve_tags(names))
+
+
+def filter_by_tags(queryset, names, match_all=False):
+    """
+    Статьи хотя бы с одним из тегов (или со всеми при match_all). Теги сравниваются по slug
+    через уникальный индекс, статьи отбираются подзапросом к таблице связей, поэтому без JOIN-дублей и DISTINCT.
+    """
+    slugs = list(OrderedDict.fromkeys(tag_slug(name) for name in names if tag_slug(name)))
+    if not slugs:
+        return queryset
+    links = Article.tags.through.objects.filter(tag__slug__in=slugs)
+    if match_all and len(slugs) > 1:
+        links = links.values('article').annotate(matched=Count('tag')).filter(matched=len(slugs))
+    return queryset.filter(pk__in=links.values('article'))
@@ -0,0 +1,23 @@
+from django import template
+from django.db.models import prefetch_related_objects
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from webapp.cache import get_article_rows, set_article_rows
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def article_rows(context, articles):
+    articles = list(articles)
+    keys, cached = get_article_rows(articles)
+    missing = [article for article in articles if keys[article.pk] not in cached]
+    if missing:
+        prefetch_related_objects(missing, 'tags')
+        rendered = {keys[article.pk]: render_to_string('article/partial/article_row.html',
+                                                       {'article': article}, request=context.get('request'))
+                    for article in missing}
+        set_article_rows(rendered)
+        cached.update(rendered)
+    return mark_safe(''.join(cached[keys[article.pk]] for article in articles))
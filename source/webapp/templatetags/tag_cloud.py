@@ -0,0 +1,35 @@
+import math
+
+from django import template
+from django.conf import settings
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from webapp.cache import get_tag_cloud, set_tag_cloud
+from webapp.models import TagStats
+
+register = template.Library()
+
+CLOUD_WEIGHTS = 5
+
+
+def popular_tags(limit):
+    return TagStats.objects.filter(articles_count__gt=0).select_related('tag') \
+        .order_by('-articles_count', 'name')[:limit]
+
+
+@register.simple_tag(takes_context=True)
+def tag_cloud(context):
+    """Облако популярных тегов из TagStats; фрагмент кешируется до следующего изменения тегов."""
+    content = get_tag_cloud()
+    if content is None:
+        stats = list(popular_tags(settings.TAG_CLOUD_SIZE))
+        top = stats[0].articles_count if stats else 1
+        for item in stats:
+            # Логарифмическая шкала, иначе один очень популярный тег сжимает все остальные до минимума.
+            item.weight = 1 + round((CLOUD_WEIGHTS - 1) * math.log(item.articles_count) / math.log(top)) \
+                if top > 1 else 1
+        stats.sort(key=lambda item: item.name)
+        content = render_to_string('partial/tag_cloud.html', {'tags': stats}, request=context.get('request'))
+        set_tag_cloud(content)
+    return mark_safe(content)
@@ -1,3 +1,1192 @@
-from django.test import TestCase
+import importlib
+import asyncio
+import io
+import json
+import os
+import queue
+import sys
+import threading
+import re
+import sqlite3
+import tempfile
+import time
+from datetime import datetime, timezone
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import request_finished, request_started
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.test import Client, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from unittest import mock
+from django.urls import reverse
+
+from webapp import benchmark
+from webapp.asgi import AsgiHandler
+from webapp.cache import bump_page_cache_generation, row_version_key
+from webapp.comment_queue import CommentQueue
+from webapp.counters import recount_comments
+from webapp.db import write_atomic
+from webapp.models import Article, Category, Comment, RelatedArticle, SearchTerm, Tag, TagStats
+from webapp import related
+from webapp.related import rebuild_related
+from webapp.search import reindex_articles, search_articles
+from webapp.search_cache import search_cache
+from webapp.tags import resolve_tags, set_article_tags
+from webapp.templatetags.tag_cloud import tag_cloud
+from webapp.view_counter import ViewCounter
+from webapp.views.api_views import ArticleExportApiView
+
+
+class IdleViewCounter(ViewCounter):
+    """Счётчик без фонового потока: пишет только по явному flush()."""
+
+    def start(self):
+        pass
+
+
+# Иначе просмотры из тестов копятся в общем счётчике и пишутся при выходе в уже удалённую базу.
+view_counter_patcher = mock.patch('webapp.views.article_views.view_counter', IdleViewCounter())
+
+
+def setUpModule():
+    view_counter_patcher.start()
+
+
+def tearDownModule():
+    view_counter_patcher.stop()
+
+
+class ArticleSearchTest(TestCase):
+    def setUp(self):
+        self.python = Article.objects.create(title='Python tips', text='Generators and iterators', author='Ann')
+        self.django = Article.objects.create(title='Django', text='Python web framework for python developers', author='Bob')
+        self.other = Article.objects.create(title='Cooking', text='Soup', author='Ann')
+        self.django.tags.add(Tag.objects.create(name='orm'))
+        Comment.objects.create(article=self.other, text='Needs more python', author='Carl')
+
+    def search(self, **data):
+        params = {'in_title': 'on', 'in_text': 'on', 'in_tags': 'on', 'in_comment_text': 'on',
+                  'in_articles': 'on', 'in_comments': 'on'}
+        params.update(data)
+        return self.client.post(reverse('article_search'), params)
+
+    def test_ranks_title_matches_first(self):
+        response = self.search(text='python')
+        self.assertEqual(list(response.context['articles']), [self.python, self.django, self.other])
+
+    def test_respects_field_flags(self):
+        response = self.search(text='python', in_title='', in_comment_text='')
+        self.assertEqual(list(response.context['articles']), [self.django])
+
+    def test_index_follows_tag_and_comment_changes(self):
+        self.assertEqual(list(self.search(text='orm').context['articles']), [self.django])
+        Tag.objects.filter(name='orm').get().delete()
+        self.assertEqual(list(self.search(text='orm').context['articles']), [])
+        Comment.objects.filter(article=self.other).delete()
+        self.assertNotIn(self.other, self.search(text='python').context['articles'])
+
+    def test_author_in_comments(self):
+        response = self.search(author='carl', in_articles='')
+        self.assertEqual(list(response.context['articles']), [self.other])
+
+
+class QueryCountTest(TestCase):
+    """Количество запросов страницы не должно зависеть от числа строк на ней."""
+
+    def create_articles(self, count):
+        for i in range(count):
+            article = Article.objects.create(title='Article %d' % i, text='Python text', author='Ann')
+            article.tags.add(*[Tag.objects.create(name='tag%d_%d' % (article.pk, j)) for j in range(3)])
+            Comment.objects.create(article=article, text='Comment', author='Bob')
+
+    def count_queries(self, method, url, data=None):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data)
+        self.assertEqual(response.status_code, 200)
+        return len(context)
+
+    def assertQueriesIndependentOfPageSize(self, method, url, data=None):
+        self.create_articles(1)
+        small = self.count_queries(method, url, data)
+        self.create_articles(3)
+        self.assertEqual(self.count_queries(method, url, data), small)
+
+    def test_index(self):
+        self.assertQueriesIndependentOfPageSize('get', reverse('index'))
+
+    def test_index_filtered_by_tag(self):
+        Tag.objects.create(name='common')
+        url = reverse('index')
+        self.create_articles(1)
+        Tag.objects.get(name='common').articles.set(Article.objects.all())
+        small = self.count_queries('get', url, {'search': 'common'})
+        self.create_articles(3)
+        Tag.objects.get(name='common').articles.set(Article.objects.all())
+        self.assertEqual(self.count_queries('get', url, {'search': 'common'}), small)
+
+    def test_search(self):
+        self.assertQueriesIndependentOfPageSize('post', reverse('article_search'), {
+            'text': 'python', 'in_text': 'on', 'in_articles': 'on'})
+
+    def test_article_tags(self):
+        article = Article.objects.create(title='Article', text='Text', author='Ann')
+        url = reverse('article_view', kwargs={'pk': article.pk})
+        article.tags.add(Tag.objects.create(name='first'))
+        small = self.count_queries('get', url)
+        article.tags.add(*[Tag.objects.create(name='tag%d' % i) for i in range(5)])
+        self.assertEqual(self.count_queries('get', url), small)
+
+    def test_comments(self):
+        self.assertQueriesIndependentOfPageSize('get', reverse('comment_index'))
+
+
+class CommentFeedPaginationTest(TestCase):
+    def setUp(self):
+        article = Article.objects.create(title='Article', text='Text', author='Ann')
+        self.comments = [Comment.objects.create(article=article, text='Comment %d' % i) for i in range(25)]
+        # Одинаковое время создания: порядок должен определяться по id.
+        Comment.objects.filter(pk__in=[c.pk for c in self.comments[10:15]]).update(
+            created_at=self.comments[10].created_at)
+
+    def test_walks_all_pages_forward_and_back(self):
+        expected = list(Comment.objects.order_by('-created_at', '-id').values_list('pk', flat=True))
+        pages, url = [], reverse('comment_index')
+        response = self.client.get(url)
+        while True:
+            pages.append([c.pk for c in response.context['comments']])
+            page = response.context['page_obj']
+            if not page.has_next():
+                break
+            response = self.client.get(url, {'cursor': page.next_cursor})
+        self.assertEqual(sum(pages, []), expected)
+
+        response = self.client.get(url, {'cursor': response.context['page_obj'].previous_cursor})
+        self.assertEqual([c.pk for c in response.context['comments']], pages[-2])
+
+    def test_invalid_cursor(self):
+        self.assertEqual(self.client.get(reverse('comment_index'), {'cursor': 'garbage'}).status_code, 404)
+
+
+@override_settings(INDEX_KEYSET_PAGINATION=True)
+class IndexKeysetPaginationTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        tag = Tag.objects.create(name='python')
+        for i in range(9):
+            article = Article.objects.create(title='Article %d' % i, text='Text', author='Ann')
+            if i % 3:
+                article.tags.add(tag)
+
+    def test_keeps_tag_filter_between_pages(self):
+        expected = list(Article.objects.filter(tags__name='python').order_by('-created_at', '-id'))
+        response = self.client.get(reverse('index'), {'search': 'python'})
+        self.assertEqual(response.context['total_count'], 6)
+        self.assertContains(response, '&search=python')
+        articles = list(response.context['articles'])
+        response = self.client.get(reverse('index'), {'search': 'python',
+                                                      'cursor': response.context['page_obj'].next_cursor})
+        articles += response.context['articles']
+        self.assertEqual(articles, expected)
+        self.assertFalse(response.context['page_obj'].has_next())
+
+
+class TagResolutionTest(TestCase):
+    def test_reuses_tags_case_insensitively(self):
+        existing = Tag.objects.create(name='Python')
+        tags = resolve_tags(['python', 'Django', 'django'])
+        self.assertEqual(tags[0], existing)
+        self.assertEqual([tag.name for tag in tags], ['Python', 'Django'])
+        self.assertEqual(Tag.objects.count(), 2)
+
+    def test_slug_ignores_unicode_case_and_spaces(self):
+        existing = Tag.objects.create(name='Веб  Разработка')
+        self.assertEqual(existing.slug, 'веб разработка')
+        self.assertEqual(resolve_tags([' веб разработка ', 'ВЕБ РАЗРАБОТКА']), [existing])
+
+    def test_filter_by_several_tags(self):
+        both, python, django = [Article.objects.create(title=title, text='Text', author='Ann')
+                                for title in ('Both', 'Python', 'Django')]
+        set_article_tags(both, ['Python', 'Django'])
+        set_article_tags(python, ['python'])
+        set_article_tags(django, ['django'])
+
+        def titles(**params):
+            response = self.client.get(reverse('index'), params)
+            return [article.title for article in response.context['articles']]
+
+        self.assertEqual(titles(search='PYTHON'), ['Python', 'Both'])
+        self.assertEqual(titles(search='python, Django'), ['Django', 'Python', 'Both'])
+        self.assertEqual(titles(search='python,django', match='all'), ['Both'])
+        self.assertEqual(titles(search='python,python', match='all'), ['Python', 'Both'])
+
+    def test_article_save_costs_fixed_number_of_queries(self):
+        def save(tags):
+            with CaptureQueriesContext(connection) as context:
+                self.client.post(reverse('article_add'), {
+                    'title': 'Title', 'author': 'Ann', 'text': 'Text', 'tags': tags})
+            return len(context)
+
+        few = save('a1,a2')
+        self.assertEqual(save(','.join('b%d' % i for i in range(20))), few)
+
+    def test_update_replaces_tags(self):
+        article = Article.objects.create(title='Title', text='Text', author='Ann')
+        set_article_tags(article, ['one', 'two'])
+        self.client.post(reverse('article_update', kwargs={'pk': article.pk}), {
+            'title': 'Title', 'author': 'Ann', 'text': 'Text', 'tags': 'Two,three'})
+        self.assertEqual(sorted(article.tags.values_list('name', flat=True)), ['three', 'two'])
+
+
+class ArticleRowCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.article = Article.objects.create(title='Title', text='Text', author='Ann')
+        self.tag = Tag.objects.create(name='python')
+        self.article.tags.add(self.tag)
+
+    def test_warm_page_skips_tag_queries(self):
+        self.client.get(reverse('index'))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('index'))
+        self.assertContains(response, 'python')
+        self.assertFalse([q for q in context.captured_queries if 'webapp_tag' in q['sql']])
+
+    def test_invalidated_by_tag_and_article_changes(self):
+        self.client.get(reverse('index'))
+        self.tag.name = 'django'
+        self.tag.save()
+        self.assertContains(self.client.get(reverse('index')), 'django')
+        self.article.tags.add(Tag.objects.create(name='orm'))
+        self.assertContains(self.client.get(reverse('index')), 'orm')
+        self.article.text = 'Changed text'
+        self.article.save()
+        self.assertContains(self.client.get(reverse('index')), 'Changed text')
+
+    def test_evicted_version_does_not_revive_old_rows(self):
+        cache.delete(row_version_key(self.article.pk))
+        self.client.get(reverse('index'))
+        self.article.tags.add(Tag.objects.create(name='orm'))
+        self.assertContains(self.client.get(reverse('index')), 'orm')
+        cache.delete(row_version_key(self.article.pk))
+        bump_page_cache_generation()
+        self.assertRegex(self.client.get(reverse('index')).content.decode(), r'<div class="mx-3">\s*orm\s*</div>')
+
+
+class PageCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.article = Article.objects.create(title='Title', text='Text', author='Ann')
+        self.url = reverse('article_view', kwargs={'pk': self.article.pk})
+
+    def test_anonymous_page_served_from_cache(self):
+        self.client.get(reverse('index'))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('index'))
+        self.assertContains(response, 'Title')
+        self.assertEqual(len(context), 1)
+
+    def test_invalidated_by_new_comment(self):
+        self.client.get(self.url)
+        Comment.objects.create(article=self.article, text='Fresh comment')
+        self.assertContains(self.client.get(self.url), 'Fresh comment')
+
+    def test_not_modified(self):
+        etag = self.client.get(self.url)['ETag']
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_authenticated_pages_not_shared(self):
+        self.client.get(self.url)
+        User.objects.create_user('ann', password='secret')
+        self.client.login(username='ann', password='secret')
+        self.assertContains(self.client.get(self.url), 'Привет, ann!')
+
+    def test_cached_page_gets_visitor_csrf_token(self):
+        self.client.get(self.url)
+        client = Client(enforce_csrf_checks=True)
+        response = client.get(self.url)
+        token = re.search(r'name="csrfmiddlewaretoken" value="([^"]+)"', response.content.decode()).group(1)
+        response = client.post(reverse('comment_create_in_article', kwargs={'article_pk': self.article.pk}),
+                               {'text': 'Comment', 'author': 'Bob', 'csrfmiddlewaretoken': token})
+        self.assertEqual(response.status_code, 302)
+
+
+class ArticleConditionalGetTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.article = Article.objects.create(title='Title', text='Text', author='Ann')
+        self.url = reverse('article_view', kwargs={'pk': self.article.pk})
+
+    def test_not_modified_costs_one_query(self):
+        etag = self.client.get(self.url)['ETag']
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(context), 1)
+
+    def test_etag_follows_own_comments_only(self):
+        etag = self.client.get(self.url)['ETag']
+        Article.objects.create(title='Other', text='Text', author='Bob')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        comment = Comment.objects.create(article=self.article, text='Comment')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+        etag = self.client.get(self.url)['ETag']
+        comment.delete()
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_missing_article(self):
+        self.assertEqual(self.client.get(reverse('article_view', kwargs={'pk': 999})).status_code, 404)
+
+
+class CommentCountersTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.first = Article.objects.create(title='First', text='Text', author='Ann')
+        self.second = Article.objects.create(title='Second', text='Text', author='Ann')
+
+    def test_counters_follow_create_and_delete(self):
+        self.client.post(reverse('comment_create_in_article', kwargs={'article_pk': self.first.pk}),
+                         {'text': 'One', 'author': 'Bob'})
+        self.client.post(reverse('comment_add'), {'article': self.first.pk, 'text': 'Two', 'author': 'Bob'})
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.comments_count, 2)
+        last = Comment.objects.latest('created_at')
+        self.assertEqual(self.first.last_commented_at, last.created_at)
+
+        self.client.post(reverse('comment_delete', kwargs={'pk': last.pk}))
+        self.first.refresh_from_db()
+        self.assertEqual(self.first.comments_count, 1)
+        self.assertEqual(self.first.last_commented_at, Comment.objects.get().created_at)
+
+    def test_counters_follow_moved_comment(self):
+        comment = Comment.objects.create(article=self.first, text='Comment')
+        comment.article = self.second
+        comment.save()
+        self.first.refresh_from_db()
+        self.second.refresh_from_db()
+        self.assertEqual((self.first.comments_count, self.second.comments_count), (0, 1))
+        self.assertIsNone(self.first.last_commented_at)
+        self.assertEqual(self.second.last_commented_at, comment.created_at)
+
+    def test_moved_comment_reindexed(self):
+        comment = Comment.objects.create(article=self.first, text='zebraword')
+        comment.article = self.second
+        comment.save()
+        self.assertEqual(list(search_articles('zebraword')), [self.second.pk])
+
+    def test_comment_terms_updated_incrementally(self):
+        def comment_terms():
+            return sorted(SearchTerm.objects.filter(field=SearchTerm.FIELD_COMMENTS)
+                          .values_list('article_id', 'term', 'weight'))
+
+        Comment.objects.create(article=self.first, text='red green')
+        edited = Comment.objects.create(article=self.first, text='red blue')
+        moved = Comment.objects.create(article=self.first, text='green')
+        edited.text = 'blue blue'
+        edited.save()
+        moved.article = self.second
+        moved.save()
+        Comment.objects.create(article=self.second, text='gone').delete()
+        with CaptureQueriesContext(connection) as queries:
+            Comment.objects.create(article=self.first, text='red')
+        self.assertFalse(any('"webapp_comment"."text"' in query['sql'] for query in queries.captured_queries))
+        incremental = comment_terms()
+        reindex_articles([self.first.pk, self.second.pk], (SearchTerm.FIELD_COMMENTS,))
+        self.assertEqual(incremental, comment_terms())
+        self.assertIn((self.first.pk, 'red', 2), incremental)
+
+    def test_recount(self):
+        Comment.objects.create(article=self.second, text='Comment')
+        Article.objects.update(comments_count=10, last_commented_at=None)
+        recount_comments()
+        self.assertEqual(list(Article.objects.order_by('pk').values_list('comments_count', flat=True)), [0, 1])
+        self.assertIsNotNone(Article.objects.get(pk=self.second.pk).last_commented_at)
+
+    def test_index_orderings(self):
+        Comment.objects.create(article=self.first, text='Comment')
+        Comment.objects.create(article=self.first, text='Comment')
+        Comment.objects.create(article=self.second, text='Comment')
+        response = self.client.get(reverse('index'), {'order': 'comments'})
+        self.assertEqual(list(response.context['articles']), [self.first, self.second])
+        response = self.client.get(reverse('index'), {'order': 'activity'})
+        self.assertEqual(list(response.context['articles']), [self.second, self.first])
+
+
+class QueryPlanTest(TestCase):
+    """
+    Запросы страниц не должны полностью сканировать таблицы. Списки без фильтра
+    ещё и не должны сортировать во временном B-дереве: порядок берётся из индекса.
+    """
+
+    def setUp(self):
+        cache.clear()
+        for i in range(3):
+            article = Article.objects.create(title='Python %d' % i, text='Text', author='Ann')
+            set_article_tags(article, ['python', 'tag%d' % i])
+            Comment.objects.create(article=article, text='Python comment', author='Bob')
+        self.article = article
+
+    def assertNoFullScans(self, method, url, data=None, allow_sort=False):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            getattr(self.client, method)(url, data)
+        with connection.cursor() as cursor:
+            for query in context.captured_queries:
+                if not query['sql'].startswith('SELECT'):
+                    continue
+                cursor.execute('EXPLAIN QUERY PLAN ' + query['sql'])
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    self.assertNotRegex(detail, r'^SCAN (TABLE )?webapp_\w+( AS \w+)?$', query['sql'])
+                    if not allow_sort:
+                        self.assertNotIn('TEMP B-TREE FOR ORDER BY', detail, query['sql'])
+
+    def test_index(self):
+        self.assertNoFullScans('get', reverse('index'))
+        self.assertNoFullScans('get', reverse('index'), {'search': 'PYTHON'}, allow_sort=True)
+        self.assertNoFullScans('get', reverse('index'), {'search': 'python,tag1'}, allow_sort=True)
+        self.assertNoFullScans('get', reverse('index'), {'search': 'python,tag1', 'match': 'all'}, allow_sort=True)
+        self.assertNoFullScans('get', reverse('index'), {'order': 'comments'})
+        self.assertNoFullScans('get', reverse('index'), {'order': 'activity'})
+
+    def test_article(self):
+        self.assertNoFullScans('get', reverse('article_view', kwargs={'pk': self.article.pk}))
+
+    def test_search(self):
+        self.assertNoFullScans('post', reverse('article_search'), {'text': 'python', 'in_title': 'on'},
+                               allow_sort=True)
+        self.assertNoFullScans('post', reverse('article_search'), {
+            'author': 'BOB', 'in_articles': 'on', 'in_comments': 'on'}, allow_sort=True)
+
+    def test_comments(self):
+        self.assertNoFullScans('get', reverse('comment_index'))
+
+    def test_lookup(self):
+        self.assertNoFullScans('get', reverse('article_lookup'), {'q': 'pyth'}, allow_sort=True)
+
+
+class LookupTest(TestCase):
+    def setUp(self):
+        for i in range(30):
+            Article.objects.create(title='Python %02d' % i, text='Text', author='Ann')
+        Article.objects.create(title='Django', text='Text', author='Ann')
+
+    def test_prefix_lookup_is_paginated(self):
+        data = self.client.get(reverse('article_lookup'), {'q': 'pyth'}).json()
+        self.assertEqual(len(data['results']), 20)
+        self.assertTrue(data['has_next'])
+        data = self.client.get(reverse('article_lookup'), {'q': 'pyth', 'page': 2}).json()
+        self.assertEqual([item['text'] for item in data['results']], ['Python %02d' % i for i in range(20, 30)])
+        self.assertFalse(data['has_next'])
+
+    def test_comment_form_does_not_load_all_articles(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('comment_add'))
+        self.assertFalse([q for q in context.captured_queries if 'webapp_article' in q['sql']])
+        self.assertNotContains(response, 'Python 00')
+        self.assertContains(response, 'data-lookup-url="%s"' % reverse('article_lookup'))
+
+    def test_selected_article_rendered(self):
+        article = Article.objects.get(title='Django')
+        comment = Comment.objects.create(article=article, text='Comment')
+        response = self.client.get(reverse('comment_update', kwargs={'pk': comment.pk}))
+        self.assertContains(response, '<option value="%d" selected>Django</option>' % article.pk, html=True)
+        self.assertNotContains(response, 'Python 00')
+
+
+class ArticleApiTest(TestCase):
+    def setUp(self):
+        self.articles = []
+        for i in range(5):
+            article = Article.objects.create(title='Article %d' % i, text='Text', author='Ann')
+            set_article_tags(article, ['tag%d' % i, 'common'])
+            Comment.objects.create(article=article, text='Comment %d' % i)
+            self.articles.append(article)
+
+    def test_cursor_pagination_with_sparse_fields(self):
+        url = reverse('api_article_list')
+        data = self.client.get(url, {'limit': 3, 'fields': 'title'}).json()
+        self.assertEqual(data['results'], [{'title': 'Article 4'}, {'title': 'Article 3'}, {'title': 'Article 2'}])
+        data = self.client.get(url, {'limit': 3, 'fields': 'title', 'cursor': data['next']}).json()
+        self.assertEqual([item['title'] for item in data['results']], ['Article 1', 'Article 0'])
+        self.assertIsNone(data['next'])
+
+    def test_embedded_relations_use_fixed_queries(self):
+        with self.assertNumQueries(3):
+            data = self.client.get(reverse('api_article_list'), {'embed': 'tags,comments'}).json()
+        self.assertEqual(sorted(data['results'][0]['tags']), ['common', 'tag4'])
+        self.assertEqual(data['results'][0]['comments'][0]['text'], 'Comment 4')
+
+    def test_batch(self):
+        ids = '%d,%d,999' % (self.articles[2].pk, self.articles[0].pk)
+        data = self.client.get(reverse('api_article_batch'), {'ids': ids, 'fields': 'id'}).json()
+        self.assertEqual(data['results'], [{'id': self.articles[2].pk}, {'id': self.articles[0].pk}])
+
+    def test_export_streams_ndjson(self):
+        response = self.client.get(reverse('api_article_export'), {'fields': 'id,title', 'embed': 'tags'})
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['title'] for line in lines], ['Article %d' % i for i in range(5)])
+
+    def test_unknown_field(self):
+        response = self.client.get(reverse('api_article_list'), {'fields': 'password'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ExportImportTest(TestCase):
+    def test_round_trip(self):
+        category = Category.objects.create(name='News')
+        article = Article.objects.create(title='Python', text='Text', author='Ann', category=category)
+        set_article_tags(article, ['python', 'Django'])
+        Comment.objects.create(article=article, text='Great post', author='Bob')
+        created_at = Article.objects.get().created_at
+        Article.objects.update(views_count=42)
+        Tag.objects.filter(name='Django').update(created_at=datetime(2019, 10, 1, 12, 30, tzinfo=timezone.utc))
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'blog.ndjson.gz')
+            call_command('export_blog', path, stderr=io.StringIO())
+            Comment.objects.all().delete()
+            Article.objects.all().delete()
+            Category.objects.all().delete()
+            Tag.objects.filter(name='Django').delete()
+            call_command('import_blog', path, '--batch-size=1', stderr=io.StringIO())
+
+        article = Article.objects.get()
+        self.assertEqual(article.created_at, created_at)
+        self.assertEqual(article.category.name, 'News')
+        self.assertEqual(sorted(article.tags.values_list('name', flat=True)), ['Django', 'python'])
+        self.assertEqual(Tag.objects.get(name='Django').created_at, datetime(2019, 10, 1, 12, 30, tzinfo=timezone.utc))
+        self.assertEqual(article.comments_count, 1)
+        self.assertEqual(article.views_count, 42)
+        self.assertEqual(list(search_articles('great')), [article.pk])
+
+    def test_failed_import_rebuilds_saved_rows(self):
+        rows = [
+            {'model': 'article', 'id': 1, 'title': 'Python', 'text': 'Text', 'author': 'Ann', 'category_id': None,
+             'created_at': '2019-10-01T12:00:00+00:00', 'updated_at': '2019-10-01T12:00:00+00:00'},
+            {'model': 'comment', 'id': 1, 'article_id': 1, 'text': 'Great', 'author': 'Bob',
+             'created_at': '2019-10-01T13:00:00+00:00', 'updated_at': '2019-10-01T13:00:00+00:00'},
+            {'model': 'comment', 'id': 1, 'article_id': 1, 'text': 'Duplicate', 'author': 'Bob',
+             'created_at': '2019-10-01T14:00:00+00:00', 'updated_at': '2019-10-01T14:00:00+00:00'},
+        ]
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'blog.ndjson')
+            with open(path, 'w') as f:
+                f.writelines(json.dumps(row) + '\n' for row in rows)
+            with self.assertRaisesMessage(CommandError, 'Уже сохранено: article: 1, comment: 1.'):
+                call_command('import_blog', path, '--batch-size=1', stderr=io.StringIO())
+
+        self.assertEqual(Article.objects.get().comments_count, 1)
+        self.assertEqual(list(search_articles('great')), [1])
+
+
+class SeedAndBenchmarkTest(TestCase):
+    def seed(self):
+        call_command('seed_blog', '--articles=30', '--tags=10', '--comments-per-article=3', '--categories=2',
+                     stderr=io.StringIO())
+        return list(Article.objects.order_by('pk').values_list('title', 'comments_count'))
+
+    def test_seed_is_reproducible(self):
+        first = self.seed()
+        self.assertEqual(len(first), 30)
+        self.assertEqual(sum(count for _, count in first), Comment.objects.count())
+        Article.objects.all().delete()
+        self.assertEqual([title for title, _ in self.seed()], [title for title, _ in first])
+
+    def test_benchmark_covers_views(self):
+        self.seed()
+        results = benchmark.run(requests=2, warmup=0, only=['index', 'article', 'comments', 'search_text'])
+        self.assertEqual(set(results), {'index', 'article', 'comments', 'search_text'})
+        for metrics in results.values():
+            self.assertEqual(metrics['status'], [200])
+            self.assertGreater(metrics['p95_ms'], 0)
+
+
+class RequestMetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        Article.objects.create(title='Title', text='Text', author='Ann')
+
+    def test_server_timing_header(self):
+        with self.assertLogs('webapp.requests', 'INFO') as logs:
+            response = self.client.get(reverse('comment_add'))
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="\d+ queries", tpl;dur=[\d.]+, total;dur=')
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'comment_add')
+        self.assertGreater(record['render_ms'], 0)
+        self.assertEqual(record['size'], len(response.content))
+
+    @override_settings(SLOW_QUERY_MS=0, SLOW_QUERY_SAMPLE_RATE=1.0)
+    def test_slow_queries_logged_with_view(self):
+        with self.assertLogs('webapp.slow_queries', 'WARNING') as logs:
+            self.client.get(reverse('index'))
+        record = json.loads(logs.records[0].getMessage())
+        self.assertEqual(record['view'], 'index')
+        self.assertIn('webapp_article', record['sql'])
+
+
+class ProdSettingsTest(TestCase):
+    ENV = {'BLOG_SECRET_KEY': 'secret', 'BLOG_ALLOWED_HOSTS': 'example.com, www.example.com'}
+
+    def load(self, **env):
+        sys.modules.pop('blog.settings.prod', None)
+        with mock.patch.dict(os.environ, dict(self.ENV, **env)):
+            return importlib.import_module('blog.settings.prod')
+
+    def tearDown(self):
+        sys.modules.pop('blog.settings.prod', None)
+
+    def test_prod_profile(self):
+        prod = self.load()
+        self.assertFalse(prod.DEBUG)
+        self.assertEqual(prod.ALLOWED_HOSTS, ['example.com', 'www.example.com'])
+        self.assertEqual(prod.DATABASES['default']['CONN_MAX_AGE'], 600)
+        self.assertEqual(prod.TEMPLATES[0]['OPTIONS']['loaders'][0][0], 'django.template.loaders.cached.Loader')
+        self.assertEqual(prod.SQLITE_PRAGMAS['journal_mode'], 'WAL')
+        self.assertEqual(prod.CACHES['default']['BACKEND'], 'django.core.cache.backends.memcached.MemcachedCache')
+        self.assertEqual(prod.CACHES['default']['LOCATION'], ['127.0.0.1:11211'])
+
+    def test_debug_refused(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.load(BLOG_DEBUG='1')
+
+    def test_secret_key_required(self):
+        with mock.patch.dict(os.environ, {'BLOG_SECRET_KEY': ''}):
+            os.environ.pop('BLOG_SECRET_KEY')
+            sys.modules.pop('blog.settings.prod', None)
+            with self.assertRaises(ImproperlyConfigured):
+                importlib.import_module('blog.settings.prod')
+
+
+@override_settings(SLOW_QUERY_MS=60000)
+class ConcurrentWriteTest(TransactionTestCase):
+    THREADS = 8
+    POSTS = 10
+
+    def setUp(self):
+        cache.clear()
+
+    def test_concurrent_comment_posts_are_not_lost(self):
+        article = Article.objects.create(title='Title', text='Text', author='Ann')
+        url = reverse('comment_create_in_article', kwargs={'article_pk': article.pk})
+        start = threading.Barrier(self.THREADS)
+        statuses = []
+
+        def poster(number):
+            client = Client()
+            try:
+                start.wait()
+                for post in range(self.POSTS):
+                    response = client.post(url, {'author': 'user%d' % number, 'text': 'post %d' % post})
+                    statuses.append(response.status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=poster, args=(number,)) for number in range(self.THREADS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        total = self.THREADS * self.POSTS
+        self.assertEqual(statuses, [302] * total)
+        self.assertEqual(Comment.objects.filter(article=article).count(), total)
+        article.refresh_from_db()
+        self.assertEqual(article.comments_count, total)
+
+    def test_write_atomic_retries_locked_database(self):
+        calls = []
+
+        @write_atomic
+        def save():
+            calls.append(1)
+            if len(calls) < 3:
+                raise OperationalError('database is locked')
+            return Category.objects.create(name='Python')
+
+        with override_settings(SQLITE_WRITE_RETRY_DELAY=0):
+            self.assertEqual(save().name, 'Python')
+        self.assertEqual(len(calls), 3)
+
+    def test_write_atomic_gives_up(self):
+        @write_atomic
+        def save():
+            raise OperationalError('database is locked')
+
+        with override_settings(SQLITE_WRITE_RETRIES=2, SQLITE_WRITE_RETRY_DELAY=0):
+            with self.assertRaises(OperationalError):
+                save()
+
+
+@override_settings(COMMENT_QUEUE=True, COMMENT_QUEUE_INTERVAL=0.01)
+class CommentQueueTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.queue = CommentQueue()
+        patcher = mock.patch('webapp.views.comment_views.comment_queue', self.queue)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.article = Article.objects.create(title='Title', text='Text', author='Ann')
+        self.url = reverse('comment_create_in_article', kwargs={'article_pk': self.article.pk})
+
+    def test_comments_written_in_batches(self):
+        with self.assertLogs('webapp.comment_queue', 'INFO'):
+            for number in range(5):
+                response = self.client.post(self.url, {'author': 'Bob', 'text': 'queued%d' % number})
+                self.assertRedirects(response, reverse('article_view', kwargs={'pk': self.article.pk}),
+                                     fetch_redirect_response=False)
+            self.queue.flush()
+        self.assertEqual(Comment.objects.filter(article=self.article).count(), 5)
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.comments_count, 5)
+        self.assertEqual(list(search_articles('queued3')), [self.article.pk])
+        stats = self.queue.stats()
+        self.assertEqual((stats['depth'], stats['written'], stats['failed']), (0, 5, 0))
+        self.assertGreater(stats['max_batch_ms'], 0)
+
+    def test_pending_message_bypasses_page_cache(self):
+        article_url = reverse('article_view', kwargs={'pk': self.article.pk})
+        self.client.get(article_url)
+        with self.assertLogs('webapp.comment_queue', 'INFO'):
+            response = self.client.post(self.url, {'author': 'Bob', 'text': 'Hello'}, follow=True)
+            self.assertContains(response, 'появится на странице через несколько секунд')
+            self.assertNotContains(self.client.get(article_url), 'появится на странице')
+            self.queue.flush()
+
+    def test_comment_for_deleted_article_dropped(self):
+        self.queue.queue = queue.Queue()
+        self.queue.queue.put(Comment(article=self.article, author='Bob', text='Hello'))
+        Article.objects.filter(pk=self.article.pk).delete()
+        with self.assertLogs('webapp.comment_queue', 'INFO'):
+            self.queue.flush()
+        self.assertEqual(self.queue.stats()['written'], 0)
+        self.assertEqual(self.queue.stats()['failed'], 0)
+
+    @override_settings(COMMENT_QUEUE_RETRIES=2)
+    def test_bad_comment_does_not_lose_batch(self):
+        self.queue.queue = queue.Queue()
+        self.queue.queue.put(Comment(article=self.article, author='Bob', text='Hello'))
+        self.queue.queue.put(Comment(article=self.article, author='Bob', text=None))
+        with self.assertLogs('webapp.comment_queue', 'INFO') as logs:
+            self.queue.flush()
+        self.assertEqual(Comment.objects.get().text, 'Hello')
+        self.assertEqual((self.queue.stats()['written'], self.queue.stats()['failed']), (1, 1))
+        self.assertEqual(sum('retry' in line for line in logs.output), 2)
+        self.assertEqual(sum('Comment lost' in line for line in logs.output), 1)
+
+
+class AsgiHandlerTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.handler = AsgiHandler(WSGIHandler(), max_workers=2)
+        self.addCleanup(self.handler.executor.shutdown)
+        self.article = Article.objects.create(title='Python tips', text='Text', author='Ann')
+
+    def call(self, method, url, data=None):
+        scope, body = benchmark.asgi_request(method, url, data)
+        sent = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body, 'more_body': False}
+
+        async def send(message):
+            sent.append(message)
+
+        asyncio.run(self.handler(scope, receive, send))
+        return sent[0]['status'], dict(sent[0]['headers']), [message['body'] for message in sent[1:]]
+
+    def test_get(self):
+        status, headers, body = self.call('get', reverse('article_view', kwargs={'pk': self.article.pk}))
+        self.assertEqual(status, 200)
+        self.assertTrue(headers[b'content-type'].startswith(b'text/html'))
+        self.assertIn('Python tips', b''.join(body).decode())
+
+    def test_post_with_csrf(self):
+        status, _, body = self.call('post', reverse('article_search'), {'text': 'python', 'in_title': 'on'})
+        self.assertEqual(status, 200)
+        self.assertIn('Python tips', b''.join(body).decode())
+
+    def test_streaming_response(self):
+        status, _, body = self.call('get', reverse('api_article_export'))
+        self.assertEqual(status, 200)
+        self.assertEqual(body[-1], b'')
+        self.assertEqual(json.loads(b''.join(body))['title'], 'Python tips')
+
+    def test_streaming_response_stays_on_one_thread(self):
+        threads = []
+
+        def record(**kwargs):
+            threads.append(threading.get_ident())
+
+        request_started.connect(record)
+        request_finished.connect(record)
+        self.addCleanup(request_started.disconnect, record)
+        self.addCleanup(request_finished.disconnect, record)
+        stream = ArticleExportApiView.stream
+
+        def recording_stream(view):
+            for line in stream(view):
+                record()
+                yield line
+
+        with mock.patch.object(ArticleExportApiView, 'stream', recording_stream):
+            self.call('get', reverse('api_article_export'))
+        self.assertEqual(len(threads), 3)
+        self.assertEqual(len(set(threads)), 1)
+
+    def test_server_benchmark(self):
+        results = benchmark.run_servers(requests=8, concurrency=4, client_delay=0, threads=2)
+        for metrics in results.values():
+            self.assertEqual((metrics['requests'], metrics['errors']), (8, 0))
+
+
+class TagStatsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.old = Article.objects.create(title='Old', text='Text', author='Ann')
+        self.new = Article.objects.create(title='New', text='Text', author='Ann')
+        set_article_tags(self.old, ['Python', 'Django'])
+        set_article_tags(self.new, ['python'])
+
+    def stats(self):
+        return {stats.name: (stats.articles_count, stats.last_used_at)
+                for stats in TagStats.objects.all()}
+
+    def test_maintained_from_tag_changes(self):
+        self.assertEqual(self.stats(), {
+            'python': (2, self.new.created_at),
+            'django': (1, self.old.created_at),
+        })
+        set_article_tags(self.new, ['Django'])
+        self.assertEqual(self.stats(), {
+            'python': (1, self.old.created_at),
+            'django': (2, self.new.created_at),
+        })
+        self.old.delete()
+        self.assertEqual(self.stats(), {'python': (0, None), 'django': (1, self.new.created_at)})
+
+    def test_reverse_add_and_clear(self):
+        tag = Tag.objects.create(name='Web')
+        tag.articles.add(self.old, self.new)
+        self.assertEqual(self.stats()['web'], (2, self.new.created_at))
+        tag.articles.clear()
+        self.assertEqual(self.stats()['web'], (0, None))
+
+    def test_rebuild_command(self):
+        TagStats.objects.update(articles_count=99, name='broken')
+        TagStats.objects.filter(name='broken').first().delete()
+        call_command('rebuild_tag_stats', stdout=io.StringIO())
+        self.assertEqual(self.stats(), {
+            'python': (2, self.new.created_at),
+            'django': (1, self.old.created_at),
+        })
+
+    def test_tag_cloud_cached_until_tags_change(self):
+        content = tag_cloud({})
+        self.assertRegex(content, r'tag-weight-5"[^>]*>Python</a>')
+        self.assertRegex(content, r'tag-weight-1"[^>]*>Django</a>')
+        with self.assertNumQueries(0):
+            self.assertEqual(tag_cloud({}), content)
+        set_article_tags(self.new, ['Flask'])
+        self.assertIn('Flask', tag_cloud({}))
+
+    def test_tag_pages(self):
+        self.assertContains(self.client.get(reverse('index')), '?search=Python')
+        response = self.client.get(reverse('tag_index'))
+        self.assertEqual([stats.name for stats in response.context['tags']], ['python', 'django'])
+
+
+class ArticleTextTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.article = Article.objects.create(
+            title='Title', author='Ann', text='First <b>line</b>\nsecond line\n\n' + 'word ' * 100)
+
+    def test_rendered_on_save(self):
+        self.assertTrue(self.article.body_html.startswith('<p>First &lt;b&gt;line&lt;/b&gt;<br>second line</p>'))
+        self.assertLessEqual(len(self.article.excerpt), 200)
+        self.assertTrue(self.article.excerpt.startswith('First <b>line</b> second line word'))
+        self.assertTrue(self.article.excerpt.endswith('word…'))
+
+    def test_list_pages_skip_full_text(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('index'))
+        self.assertContains(response, 'First &lt;b&gt;line&lt;/b&gt; second line')
+        self.assertNotContains(response, 'word ' * 50)
+        for query in context.captured_queries:
+            self.assertNotIn('"webapp_article"."text"', query['sql'])
+            self.assertNotIn('"webapp_article"."body_html"', query['sql'])
+        response = self.client.get(reverse('article_view', kwargs={'pk': self.article.pk}))
+        self.assertContains(response, '<br>second line</p>', html=False)
+
+    def test_backfill_command(self):
+        Article.objects.update(excerpt='', body_html='')
+        call_command('render_articles', '--missing', '--batch-size=1', stdout=io.StringIO())
+        article = Article.objects.get()
+        self.assertEqual((article.excerpt, article.body_html), (self.article.excerpt, self.article.body_html))
+
+    def test_backfill_resets_cached_rows_and_etag(self):
+        url = reverse('article_view', kwargs={'pk': self.article.pk})
+        etag = self.client.get(url)['ETag']
+        self.client.get(reverse('index'))
+        Article.objects.update(excerpt='Stale excerpt')
+        call_command('render_articles', '--batch-size=1', stdout=io.StringIO())
+        self.assertNotContains(self.client.get(reverse('index')), 'Stale excerpt')
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+
+class ViewCounterTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.counter = IdleViewCounter()
+        patcher = mock.patch('webapp.views.article_views.view_counter', self.counter)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.article = Article.objects.create(title='Python tips', text='Text', author='Ann')
+        self.url = reverse('article_view', kwargs={'pk': self.article.pk})
+
+    def test_reads_never_wait_for_write_lock(self):
+        locked = threading.Event()
+        release = threading.Event()
+
+        def hold_write_lock():
+            writer = sqlite3.connect(connection.settings_dict['NAME'], isolation_level=None)
+            writer.execute('BEGIN IMMEDIATE')
+            writer.execute("UPDATE webapp_article SET author = 'Bob'")
+            locked.set()
+            release.wait(10)
+            writer.execute('ROLLBACK')
+            writer.close()
+
+        writer = threading.Thread(target=hold_write_lock)
+        writer.start()
+        try:
+            self.assertTrue(locked.wait(5))
+            started = time.monotonic()
+            with CaptureQueriesContext(connection) as queries:
+                for _ in range(5):
+                    self.assertEqual(self.client.get(self.url).status_code, 200)
+            self.assertLess(time.monotonic() - started, 1)
+            self.assertFalse([query for query in queries if not query['sql'].startswith('SELECT')])
+        finally:
+            release.set()
+            writer.join()
+        self.assertEqual(self.counter.flush(), 5)
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.views_count, 5)
+
+    def test_counts_cached_and_not_modified_responses(self):
+        response = self.client.get(self.url)
+        self.client.get(self.url)
+        self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.client.post(self.url)
+        self.counter.flush()
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.views_count, 3)
+
+    @override_settings(VIEW_COUNTER_FLUSH_HITS=3, VIEW_COUNTER_FLUSH_INTERVAL=60)
+    def test_background_flush_after_hits(self):
+        counter = ViewCounter()
+        self.addCleanup(counter.stop)
+        for _ in range(3):
+            counter.hit(self.article.pk)
+        thread = counter.thread
+        deadline = time.monotonic() + 5
+        while not counter.flushes and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(counter.stats()['written'], 3)
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.views_count, 3)
+        counter.stop(timeout=5)
+        self.assertFalse(thread.is_alive())
+
+    def test_most_read_ordering(self):
+        other = Article.objects.create(title='Django', text='Text', author='Bob')
+        self.counter.hit(other.pk)
+        self.counter.flush()
+        response = self.client.get(reverse('index'), {'order': 'views'})
+        self.assertEqual(list(response.context['articles']), [other, self.article])
+        self.counter.hit(self.article.pk)
+        self.counter.hit(self.article.pk)
+        self.counter.flush()
+        content = self.client.get(reverse('index'), {'order': 'views'}).content.decode()
+        self.assertLess(content.index('Python tips'), content.index('Django'))
+
+
+class RelatedArticlesTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.first = Article.objects.create(title='First', text='Text', author='Ann')
+        self.second = Article.objects.create(title='Second', text='Text', author='Ann')
+        self.third = Article.objects.create(title='Third', text='Text', author='Bob')
+        self.other = Article.objects.create(title='Cooking', text='Soup', author='Bob')
+        set_article_tags(self.first, ['python', 'django'])
+        set_article_tags(self.second, ['python', 'django', 'web'])
+        set_article_tags(self.third, ['python'])
+        set_article_tags(self.other, ['soup'])
+
+    def related(self):
+        return list(RelatedArticle.objects.order_by('article', 'rank').values_list('article', 'related', 'rank'))
+
+    def test_neighbors_ranked_by_jaccard(self):
+        links = RelatedArticle.objects.filter(article=self.first).order_by('rank')
+        self.assertEqual([(link.related_id, round(link.score, 3)) for link in links],
+                         [(self.second.pk, 0.667), (self.third.pk, 0.5)])
+        self.assertFalse(RelatedArticle.objects.filter(article=self.other).exists())
+
+    def test_incremental_refresh_matches_rebuild(self):
+        set_article_tags(self.third, ['soup', 'web'])
+        self.first.tags.remove(Tag.objects.get(slug='django'))
+        Tag.objects.get(slug='python').delete()
+        incremental = self.related()
+        rebuild_related(batch_size=1)
+        self.assertEqual(incremental, self.related())
+
+    @override_settings(RELATED_ARTICLES_COUNT=1)
+    def test_deleted_neighbor_replaced(self):
+        rebuild_related()
+        self.assertEqual(self.first.related_links.get().related_id, self.second.pk)
+        self.second.delete()
+        self.assertEqual(self.first.related_links.get().related_id, self.third.pk)
+
+    def popular(self, count):
+        articles = [Article.objects.create(title='Popular %d' % i, text='Text', author='Ann') for i in range(count)]
+        Tag.objects.create(name='popular').articles.add(*articles)
+        return articles
+
+    def test_popular_tag_change_rewrites_only_changed_list(self):
+        articles = self.popular(30)
+        refresh_related = related.refresh_related
+        refreshed = []
+
+        def refresh(*args):
+            refreshed.append(refresh_related(*args))
+            return refreshed[-1]
+
+        with mock.patch('webapp.related.refresh_related', refresh), \
+                mock.patch('webapp.related.related_links', wraps=related.related_links) as full_recompute:
+            set_article_tags(articles[0], ['popular', 'rare'])
+        self.assertEqual(refreshed, [{articles[0].pk}])
+        full_recompute.assert_not_called()
+        incremental = self.related()
+        rebuild_related()
+        self.assertEqual(incremental, self.related())
+
+    def test_merged_lists_match_rebuild(self):
+        self.popular(12)
+        newest = Article.objects.create(title='Newest', text='Text', author='Ann')
+        set_article_tags(newest, ['popular'])
+        self.assertTrue(all(newest.pk in related_ids for related_ids in (
+            RelatedArticle.objects.filter(article=article).values_list('related', flat=True)
+            for article in Article.objects.filter(tags__slug='popular').exclude(pk=newest.pk))))
+        set_article_tags(newest, ['popular', 'python'])
+        incremental = self.related()
+        rebuild_related()
+        self.assertEqual(incremental, self.related())
+
+    @override_settings(RELATED_ARTICLES_BATCH_SIZE=2, RELATED_ARTICLES_COUNT=3)
+    def test_large_change_refreshed_in_batches(self):
+        articles = self.popular(7)
+        set_article_tags(articles[0], ['popular', 'python'])
+        set_article_tags(articles[1], ['popular', 'web'])
+        with mock.patch('webapp.related.write_atomic', wraps=related.write_atomic) as transactions, \
+                mock.patch('webapp.related.rebuild_related') as rebuild:
+            Tag.objects.get(slug='popular').delete()
+        rebuild.assert_not_called()
+        self.assertEqual(transactions.call_count, 4)
+        incremental = self.related()
+        rebuild_related()
+        self.assertEqual(incremental, self.related())
+
+    def test_renamed_neighbor_changes_etag(self):
+        url = reverse('article_view', kwargs={'pk': self.first.pk})
+        etag = self.client.get(url)['ETag']
+        self.second.title = 'Renamed'
+        self.second.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'Renamed')
+
+    def test_article_page_lists_related(self):
+        response = self.client.get(reverse('article_view', kwargs={'pk': self.first.pk}))
+        self.assertEqual([article.title for article in response.context['related_articles']], ['Second', 'Third'])
+        self.assertContains(response, reverse('article_view', kwargs={'pk': self.second.pk}))
+
+
+class SearchCacheTest(TestCase):
+    FLAGS = {'in_title': 'on', 'in_text': 'on', 'in_tags': 'on', 'in_comment_text': 'on'}
+
+    def setUp(self):
+        cache.clear()
+        search_cache.clear()
+        self.python = Article.objects.create(title='Python tips', text='Generators', author='Ann')
+        self.other = Article.objects.create(title='Cooking', text='Soup', author='Bob')
+
+    def search(self, **params):
+        return self.client.get(reverse('article_search'), params)
+
+    def test_normalized_query_served_from_cache(self):
+        response = self.search(text='Python  tips', **self.FLAGS)
+        self.assertEqual(response['X-Search-Cache'], 'miss')
+        stats = search_cache.stats()
+        response = self.search(text='TIPS python tips', in_text='on', in_comment_text='on', in_tags='on',
+                               in_title='on')
+        self.assertEqual(response['X-Search-Cache'], 'hit')
+        self.assertEqual(list(response.context['articles']), [self.python])
+        self.assertEqual(search_cache.stats()['hits'], stats['hits'] + 1)
+
+    def test_cached_search_rehydrates_with_one_query(self):
+        self.search(text='python', **self.FLAGS)
+        with CaptureQueriesContext(connection) as queries:
+            self.search(text='python', **self.FLAGS)
+        self.assertEqual(len([query for query in queries if 'webapp_searchterm' in query['sql']]), 0)
+        self.assertEqual(len([query for query in queries if 'webapp_article' in query['sql']]), 1)
+
+    def test_comment_invalidates_only_dependent_searches(self):
+        self.search(text='python', in_title='on')
+        self.search(text='python', in_comment_text='on')
+        Comment.objects.create(article=self.other, text='Python soup?', author='Carl')
+        self.assertEqual(self.search(text='python', in_title='on')['X-Search-Cache'], 'hit')
+        response = self.search(text='python', in_comment_text='on')
+        self.assertEqual(response['X-Search-Cache'], 'miss')
+        self.assertEqual(list(response.context['articles']), [self.other])
+
+    def test_tag_and_article_changes_invalidate(self):
+        self.assertEqual(list(self.search(text='soup', in_tags='on').context['articles']), [])
+        set_article_tags(self.python, ['soup'])
+        self.assertEqual(list(self.search(text='soup', in_tags='on').context['articles']), [self.python])
+        self.search(author='Bob', in_articles='on')
+        Article.objects.create(title='Bread', text='Flour', author='Bob')
+        response = self.search(author='Bob', in_articles='on')
+        self.assertEqual(response['X-Search-Cache'], 'miss')
+        self.assertEqual(len(response.context['articles']), 2)
+
+    def test_author_key_ignores_case(self):
+        self.search(author='Bob', in_articles='on')
+        response = self.search(author='bob', in_articles='on')
+        self.assertEqual(response['X-Search-Cache'], 'hit')
+        self.assertEqual(list(response.context['articles']), [self.other])
+
+    @override_settings(SEARCH_CACHE_SIZE=2)
+    def test_cache_is_bounded(self):
+        for text in ('python', 'soup', 'python'):
+            self.search(text=text, in_title='on', in_text='on')
+        self.search(text='generators', in_text='on')
+        self.assertEqual(self.search(text='python', in_title='on', in_text='on')['X-Search-Cache'], 'hit')
+        self.assertEqual(self.search(text='soup', in_title='on', in_text='on')['X-Search-Cache'], 'miss')
+        stats = search_cache.stats()
+        self.assertEqual((stats['size'], stats['evictions']), (2, 2))
+
+    def test_get_results_cacheable_upstream(self):
+        response = self.search(text='python', **self.FLAGS)
+        self.assertIn('public', response['Cache-Control'])
+        self.assertIn('max-age=60', response['Cache-Control'])
+        self.assertNotContains(response, 'csrfmiddlewaretoken')
+        self.assertNotIn('Cache-Control', self.client.get(reverse('article_search')))
 
-# Create your tests here.
@@ -0,0 +1,42 @@
+from django.utils.html import linebreaks
+
+EXCERPT_LENGTH = 200
+
+
+def make_excerpt(text, length=EXCERPT_LENGTH):
+    """Начало текста в одну строку, обрезанное по границе слова."""
+    text = ' '.join(text.split())
+    if len(text) <= length:
+        return text
+    cut = text[:length - 1]
+    return (cut.rsplit(' ', 1)[0] or cut) + '…'
+
+
+def render_body(text):
+    """Текст статьи в HTML: экранирован, абзацы и переносы строк размечены как у фильтра linebreaks."""
+    return linebreaks(text, autoescape=True)
+
+
+def text_fields(text):
+    return {'excerpt': make_excerpt(text), 'body_html': render_body(text)}
+
+
+def render_articles(model, batch_size=500, only_missing=False):
+    """
+    Заполняет excerpt и body_html пачками по pk через bulk_update, возвращает число статей.
+    model передаётся явно, чтобы миграция могла использовать историческую модель.
+    """
+    articles = model.objects.only('pk', 'text').order_by('pk')
+    if only_missing:
+        articles = articles.filter(body_html='')
+    count, last_pk = 0, 0
+    while True:
+        batch = list(articles.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return count
+        for article in batch:
+            for name, value in text_fields(article.text).items():
+                setattr(article, name, value)
+        model.objects.bulk_update(batch, ['excerpt', 'body_html'])
+        count += len(batch)
+        last_pk = batch[-1].pk
@@ -2,7 +2,8 @@ from django.contrib import admin
 from django.urls import path
 from webapp.views import IndexView, ArticleView, ArticleCreateView, ArticleUpdateView, \
     ArticleDeleteView, CommentView, CommentCreateView, CommentUpdateView, CommentDeleteView, CommentCreateInArticleView,\
-    ArticleSearchView
+    ArticleSearchView, ArticleLookupView, CategoryLookupView, ArticleListApiView, ArticleBatchApiView, \
+    ArticleExportApiView, TagListView
 
 urlpatterns = [
 path('', IndexView.as_view(), name='index'),
@@ -15,5 +16,11 @@ path('', IndexView.as_view(), name='index'),
     path('comment/add/', CommentCreateView.as_view(), name='comment_add'),
     path('comment/update/<int:pk>', CommentUpdateView.as_view(), name='comment_update'),
     path('comment/delete/<int:pk>', CommentDeleteView.as_view(), name='comment_delete'),
-    path('comment/add/<int:article_pk>', CommentCreateInArticleView.as_view(), name='comment_create_in_article')
+    path('comment/add/<int:article_pk>', CommentCreateInArticleView.as_view(), name='comment_create_in_article'),
+    path('lookup/articles/', ArticleLookupView.as_view(), name='article_lookup'),
+    path('lookup/categories/', CategoryLookupView.as_view(), name='category_lookup'),
+    path('api/articles/', ArticleListApiView.as_view(), name='api_article_list'),
+    path('api/articles/batch/', ArticleBatchApiView.as_view(), name='api_article_batch'),
+    path('api/articles/export/', ArticleExportApiView.as_view(), name='api_article_export'),
+    path('tags/', TagListView.as_view(), name='tag_index')
     ]
\ No newline at end of file
@@ -0,0 +1,115 @@
+import atexit
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F
+
+from webapp.cache import SEARCH_VIEWS, bump_search_generation, mark_views_flushed
+from webapp.db import write_atomic
+from webapp.models import Article
+
+logger = logging.getLogger('webapp.view_counter')
+
+
+class ViewCounter:
+    """
+    Счётчики просмотров статей в памяти процесса. Фоновый поток записывает накопленное
+    одной транзакцией раз в VIEW_COUNTER_FLUSH_INTERVAL секунд или после VIEW_COUNTER_FLUSH_HITS просмотров,
+    так что чтение страницы никогда не берёт блокировку записи SQLite. Процессы пишут приращения,
+    а не значения, поэтому счётчики нескольких воркеров складываются.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = Counter()
+        self.hits = 0
+        self.wakeup = threading.Event()
+        self.stopping = threading.Event()
+        self.thread = None
+        self.flushes = 0
+        self.written = 0
+        self.last_flush_ms = 0.0
+
+    def start(self):
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.stopping.clear()
+                self.thread = threading.Thread(target=self.run, name='view-counter', daemon=True)
+                self.thread.start()
+
+    def stop(self, timeout=None):
+        """Останавливает фоновый поток; накопленное он записывает перед выходом."""
+        with self.lock:
+            thread, self.thread = self.thread, None
+        if thread is None:
+            return
+        self.stopping.set()
+        self.wakeup.set()
+        thread.join(timeout)
+
+    def hit(self, article_id):
+        self.start()
+        with self.lock:
+            self.pending[article_id] += 1
+            self.hits += 1
+            full = self.hits >= settings.VIEW_COUNTER_FLUSH_HITS
+        if full:
+            self.wakeup.set()
+
+    def run(self):
+        try:
+            while not self.stopping.is_set():
+                self.wakeup.wait(settings.VIEW_COUNTER_FLUSH_INTERVAL)
+                self.wakeup.clear()
+                try:
+                    self.flush()
+                finally:
+                    connection.close_if_unusable_or_obsolete()
+        finally:
+            connection.close()
+
+    def flush(self):
+        """Записывает накопленные просмотры, возвращает их число. При ошибке они возвращаются в очередь."""
+        with self.lock:
+            pending, self.pending, self.hits = self.pending, Counter(), 0
+        if not pending:
+            return 0
+        started = time.perf_counter()
+        try:
+            write_atomic(self.save)(pending)
+        except Exception:
+            logger.exception('Could not write %d article views, will retry', sum(pending.values()))
+            with self.lock:
+                self.pending.update(pending)
+                self.hits += sum(pending.values())
+            return 0
+        mark_views_flushed()
+        bump_search_generation(SEARCH_VIEWS)
+        self.flushes += 1
+        self.written += sum(pending.values())
+        self.last_flush_ms = (time.perf_counter() - started) * 1000
+        return sum(pending.values())
+
+    def save(self, pending):
+        # Один UPDATE на каждое различное приращение: обычно их единицы, а не по запросу на статью.
+        by_increment = defaultdict(list)
+        for article_id, count in pending.items():
+            by_increment[count].append(article_id)
+        for count, article_ids in by_increment.items():
+            Article.objects.filter(pk__in=article_ids).update(views_count=F('views_count') + count)
+
+    def stats(self):
+        return {
+            'pending': self.hits,
+            'flushes': self.flushes,
+            'written': self.written,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+        }
+
+
+view_counter = ViewCounter()
+atexit.register(view_counter.flush)
@@ -2,3 +2,6 @@ from .article_views import IndexView, ArticleCreateView, ArticleUpdateView, \
     ArticleDeleteView, ArticleView,ArticleSearchView
 from .comment_views import CommentView, CommentCreateInArticleView, CommentCreateView, \
     CommentDeleteView, CommentUpdateView
+from .lookup_views import ArticleLookupView, CategoryLookupView
+from .api_views import ArticleListApiView, ArticleBatchApiView, ArticleExportApiView
+from .tag_views import TagListView
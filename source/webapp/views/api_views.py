@@ -0,0 +1,133 @@
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from webapp.models import Article, Comment, Tag
+from webapp.pagination import KeysetPaginator, InvalidCursor
+
+ARTICLE_FIELDS = ('id', 'title', 'text', 'author', 'category', 'created_at', 'updated_at',
+                  'comments_count', 'last_commented_at')
+EMBEDS = ('tags', 'comments')
+
+
+class ApiError(Exception):
+    pass
+
+
+def parse_list(value, allowed, name):
+    items = [item.strip() for item in value.split(',') if item.strip()] if value else []
+    unknown = set(items) - set(allowed)
+    if unknown:
+        raise ApiError('Неизвестные значения %s: %s' % (name, ', '.join(sorted(unknown))))
+    return items
+
+
+def article_to_dict(article, fields, embed):
+    data = {}
+    for field in fields:
+        data[field] = article.category_id if field == 'category' else getattr(article, field)
+    if 'tags' in embed:
+        data['tags'] = [tag.name for tag in article.tags.all()]
+    if 'comments' in embed:
+        data['comments'] = [comment_to_dict(comment) for comment in article.comments.all()]
+    return data
+
+
+def comment_to_dict(comment):
+    return {
+        'id': comment.pk,
+        'article': comment.article_id,
+        'author': comment.author,
+        'text': comment.text,
+        'created_at': comment.created_at,
+    }
+
+
+class ArticleApiMixin:
+    ordering_fields = ('id', 'created_at')
+
+    def dispatch(self, request, *args, **kwargs):
+        try:
+            self.fields = parse_list(request.GET.get('fields'), ARTICLE_FIELDS, 'fields') or list(ARTICLE_FIELDS)
+            self.embed = parse_list(request.GET.get('embed'), EMBEDS, 'embed')
+            return super().dispatch(request, *args, **kwargs)
+        except ApiError as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+    def get_queryset(self):
+        queryset = Article.objects.only(*set(self.fields) | set(self.ordering_fields))
+        if 'tags' in self.embed:
+            queryset = queryset.prefetch_related(Prefetch('tags', queryset=Tag.objects.only('name')))
+        if 'comments' in self.embed:
+            comments = Comment.objects.only('article', 'author', 'text', 'created_at').order_by('-created_at')
+            queryset = queryset.prefetch_related(Prefetch('comments', queryset=comments))
+        return queryset
+
+    def serialize(self, article):
+        return article_to_dict(article, self.fields, self.embed)
+
+
+class ArticleListApiView(ArticleApiMixin, View):
+    default_limit = 20
+    max_limit = 100
+
+    def get(self, request, *args, **kwargs):
+        try:
+            limit = min(int(request.GET.get('limit', self.default_limit)), self.max_limit)
+            if limit < 1:
+                raise ValueError(limit)
+        except ValueError:
+            raise ApiError('limit должен быть положительным числом')
+        paginator = KeysetPaginator(self.get_queryset(), limit, ('-created_at', '-id'))
+        try:
+            page = paginator.get_page(request.GET.get('cursor'))
+        except InvalidCursor:
+            raise ApiError('Неверный курсор')
+        return JsonResponse({
+            'results': [self.serialize(article) for article in page],
+            'next': page.next_cursor,
+            'previous': page.previous_cursor,
+        })
+
+
+class ArticleBatchApiView(ArticleApiMixin, View):
+    max_ids = 100
+
+    def get(self, request, *args, **kwargs):
+        try:
+            ids = [int(pk) for pk in request.GET.get('ids', '').split(',') if pk.strip()]
+        except ValueError:
+            raise ApiError('ids должен быть списком чисел через запятую')
+        if len(ids) > self.max_ids:
+            raise ApiError('Не больше %d ids за запрос' % self.max_ids)
+        articles = self.get_queryset().in_bulk(ids)
+        return JsonResponse({'results': [self.serialize(articles[pk]) for pk in ids if pk in articles]})
+
+
+class ArticleExportApiView(ArticleApiMixin, View):
+    """Все статьи в формате NDJSON; память не зависит от размера выгрузки."""
+    chunk_size = 500
+
+    def get(self, request, *args, **kwargs):
+        response = StreamingHttpResponse(self.stream(), content_type='application/x-ndjson; charset=utf-8')
+        response['Content-Disposition'] = 'attachment; filename="articles.ndjson"'
+        return response
+
+    def stream(self):
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        for article in self.iter_articles():
+            yield encoder.encode(self.serialize(article)) + '\n'
+
+    def iter_articles(self):
+        queryset = self.get_queryset().order_by('pk')
+        if not self.embed:
+            yield from queryset.iterator(chunk_size=self.chunk_size)
+            return
+        # В Django 2.2 iterator() игнорирует prefetch_related, поэтому с embed идём пачками по pk.
+        last_pk = 0
+        while True:
+            chunk = list(queryset.filter(pk__gt=last_pk)[:self.chunk_size])
+            if not chunk:
+                return
+            yield from chunk
+            last_pk = chunk[-1].pk
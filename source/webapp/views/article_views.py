@@ -1,23 +1,56 @@
-from django.db.models import QuerySet, Q
+from urllib.parse import urlencode
+
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db.models import QuerySet, Q, Max, Count
+from django.http import Http404
 from django.shortcuts import render, get_object_or_404, redirect
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from webapp.cache import article_row_generation, get_row_versions, views_flushed_at
+from webapp.db import write_atomic
 from webapp.forms import ArticleForm, CommentInArticleForm, SimpleSearchForm,FullSearchForm
 from webapp.models import Article, Comment, Tag
+from webapp.pagination import CachedCountPaginator, cached_count
+from webapp.search_cache import cached_search
+from webapp.tags import filter_by_tags, set_article_tags
+from webapp.view_counter import view_counter
 from django.views import View
 from django.views.generic import TemplateView, ListView, FormView
+from webapp.views.base_views import KeysetPaginationMixin, PageCacheMixin
+
 
+# Колонки, которые выводит article/partial/article_row.html, плюс поля сортировок; text и body_html не читаются.
+LIST_FIELDS = ('title', 'excerpt', 'created_at', 'updated_at', 'comments_count', 'last_commented_at')
 
-class IndexView(ListView):
+
+class IndexView(PageCacheMixin, KeysetPaginationMixin, ListView):
     template_name = 'article/index.html'
     model = Article
     context_object_name = 'articles'
-    ordering = ['-created_at']
     paginate_by = 4
     paginate_orphans = 1
     page_kwarg = 'page'
+    paginator_class = CachedCountPaginator
+
+    def uses_keyset_pagination(self):
+        return settings.INDEX_KEYSET_PAGINATION and self.order == Article.ORDER_NEW
+
+    def get_page_generation(self):
+        # Сортировка по просмотрам меняется при записи счётчиков, а не при правках статей.
+        generation = super().get_page_generation()
+        if self.request.GET.get('order') == Article.ORDER_VIEWS:
+            return max(generation, views_flushed_at())
+        return generation
+
+    def get_last_modified(self, generation):
+        last_modified = super().get_last_modified(generation)
+        newest = Article.objects.aggregate(newest=Max('updated_at'))['newest']
+        return max(newest, last_modified) if newest else last_modified
 
     def get(self, request, *args, **kwargs):
         self.form = SimpleSearchForm(data=request.GET)
         self.search_value = self.get_search_value()
+        self.order = self.get_order()
 
         return super().get(request, *args, **kwargs)
 
@@ -26,30 +59,79 @@ class IndexView(ListView):
             return self.form.cleaned_data['search']
         return None
 
+    def get_order(self):
+        if self.form.is_valid() and self.form.cleaned_data['order']:
+            return self.form.cleaned_data['order']
+        return Article.ORDER_NEW
+
+    def get_ordering(self):
+        return Article.ORDERINGS[self.order]
+
+    def get_match(self):
+        if self.form.is_valid() and self.form.cleaned_data['match']:
+            return self.form.cleaned_data['match']
+        return SimpleSearchForm.MATCH_ANY
+
     def get_queryset(self):
-        queryset = super().get_queryset()
+        queryset = super().get_queryset().only(*LIST_FIELDS)
         if self.search_value:
-            tag = self.search_value
-            queryset = queryset.filter(
-                Q(tags__name__iexact=tag)
-            )
+            queryset = filter_by_tags(queryset, self.search_value.split(','),
+                                      match_all=self.get_match() == SimpleSearchForm.MATCH_ALL)
         return queryset
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['search'] = SimpleSearchForm()
+        context['search'] = self.form
+        query = {
+            'search': self.search_value,
+            'match': self.get_match() if self.get_match() != SimpleSearchForm.MATCH_ANY else None,
+            'order': self.order if self.order != Article.ORDER_NEW else None,
+        }
+        query = {key: value for key, value in query.items() if value}
+        if query:
+            context['query'] = urlencode(query)
+        if self.uses_keyset_pagination():
+            context['keyset_pagination'] = True
+            context['total_count'] = cached_count(self.get_queryset())
         return context
 
 
-class ArticleView(TemplateView):
+class ArticleView(PageCacheMixin, TemplateView):
     template_name = 'article/article.html'
 
+    def dispatch(self, request, *args, **kwargs):
+        response = super().dispatch(request, *args, **kwargs)
+        # Считаются и ответы из кеша страниц, и 304, поэтому снаружи PageCacheMixin.
+        if request.method == 'GET' and response.status_code in (200, 304):
+            view_counter.hit(int(kwargs['pk']))
+        return response
+
+    def get_last_modified(self, generation):
+        # Валидатор зависит только от этой статьи и её комментариев, а не от поколения всего кеша.
+        self.validators = Article.objects.filter(pk=self.kwargs['pk']).aggregate(
+            updated_at=Max('updated_at'),
+            last_comment_at=Max('comments__updated_at'),
+            comments_count=Count('comments'),
+        )
+        if self.validators['updated_at'] is None:
+            raise Http404('Статья не найдена')
+        return max(filter(None, (self.validators['updated_at'], self.validators['last_comment_at'])))
+
+    def get_etag_source(self, generation, last_modified):
+        pk = int(self.kwargs['pk'])
+        # Общее поколение строк меняют массовые операции (render_articles, импорт), не трогающие updated_at.
+        return '%s:%s:%s:%s' % (last_modified.timestamp(), self.validators['comments_count'],
+                                get_row_versions([pk])[pk], article_row_generation())
+
     def get_context_data(self, **kwargs):
         pk = kwargs.get('pk')
         context = super().get_context_data(**kwargs)
-        context['article'] = get_object_or_404(Article, pk=pk)
+        article_qs = Article.objects.select_related('category').prefetch_related('tags')
+        context['article'] = get_object_or_404(article_qs, pk=pk)
         context['form'] = CommentInArticleForm()
         context['comments'] = Comment.objects.all().filter(article_id=pk).order_by('-created_at')
+        context['related_articles'] = Article.objects.filter(related_from__article=pk) \
+            .order_by('related_from__rank').only('title')
         return context
 
 
@@ -61,24 +143,20 @@ class ArticleCreateView(View):
     def post(self, request, *args, **kwargs):
         form = ArticleForm(data=request.POST)
         if form.is_valid():
-            article = Article.objects.create(
-                title=form.cleaned_data['title'],
-                author=form.cleaned_data['author'],
-                text=form.cleaned_data['text'],
-            )
-            tags = form.cleaned_data['tags']
-            article.tags.set(self.get_or_create_tags(tags))
+            article = self.save(form)
             return redirect('article_view', pk=article.pk)
         else:
             return render(request, 'article/create.html', context={'form': form})
 
-
-    def get_or_create_tags(self,tags):
-        result = []
-        for tag in tags:
-            clean_tag, _ = Tag.objects.get_or_create(name=tag)
-            result.append(clean_tag)
-        return result
+    @write_atomic
+    def save(self, form):
+        article = Article.objects.create(
+            title=form.cleaned_data['title'],
+            author=form.cleaned_data['author'],
+            text=form.cleaned_data['text'],
+        )
+        set_article_tags(article, form.cleaned_data['tags'])
+        return article
 
 
     def get_str_tags(self,queryset):
@@ -103,20 +181,15 @@ class ArticleUpdateView(View):
             article.title = form.cleaned_data['title']
             article.text = form.cleaned_data['text']
             article.author = form.cleaned_data['author']
-            article.tags.clear()
-            tags = form.cleaned_data['tags']
-            article.tags.set(self.get_or_create_tags(tags))
-            article.save()
+            self.save(article, form)
             return redirect('article_view', pk=article.pk)
         else:
             return render(request, 'article/update.html', context={'form': form, 'article': article})
 
-    def get_or_create_tags(self,tags):
-        result = []
-        for tag in tags:
-            clean_tag, _ = Tag.objects.get_or_create(name=tag)
-            result.append(clean_tag)
-        return result
+    @write_atomic
+    def save(self, article, form):
+        article.save()
+        set_article_tags(article, form.cleaned_data['tags'])
 
     def get_str_tags(self,queryset):
         return ','.join(([str(tag) for tag in queryset]))
@@ -128,44 +201,51 @@ class ArticleDeleteView(View):
 
     def post(self, request, *args, **kwargs):
         article = get_object_or_404(Article, pk=kwargs['pk'])
-        article.delete()
+        write_atomic(article.delete)()
         return redirect('index')
 
 
 class ArticleSearchView(FormView):
     template_name = 'article/search.html'
     form_class = FullSearchForm
+    paginate_by = 4
+
+    def get(self, request, *args, **kwargs):
+        # Поиск с параметрами в адресе: результат можно сохранить в закладки и закешировать на прокси.
+        if not request.GET:
+            return super().get(request, *args, **kwargs)
+        form = self.get_form()
+        response = self.form_valid(form) if form.is_valid() else self.form_invalid(form)
+        if request.user.is_authenticated:
+            patch_cache_control(response, private=True)
+        else:
+            patch_cache_control(response, public=True, max_age=settings.SEARCH_MAX_AGE)
+        patch_vary_headers(response, ('Cookie',))
+        return response
+
+    def get_form_kwargs(self):
+        kwargs = super().get_form_kwargs()
+        if self.request.method == 'GET' and self.request.GET:
+            kwargs['data'] = self.request.GET
+        return kwargs
 
     def form_valid(self, form):
-        text = form.cleaned_data.get('text')
-        query = Q()
-        if text:
-            in_title = form.cleaned_data.get('in_title')
-            if in_title:
-                query = query | Q(title__icontains=text)
-            in_text = form.cleaned_data.get('in_text')
-            if in_text:
-                query = query | Q(text__icontains=text)
-            in_tags = form.cleaned_data.get('in_tags')
-            if in_tags:
-                query = query | Q(tags__name__iexact=text)
-            in_comment_text = form.cleaned_data.get('in_comment_text')
-            if in_comment_text:
-                query = query | Q(comments__text__icontains=text)
-        author = form.cleaned_data.get('author')
-        author_query = Q()
-        if author:
-            in_articles = form.cleaned_data.get('in_articles')
-            if in_articles:
-                author_query = author_query | Q(author__iexact=author)
-            in_comments = form.cleaned_data.get('in_comments')
-            if in_comments:
-                author_query = author_query | Q(comments__author__iexact=author)
-            if not text:
-                query = author_query
-        if author and text:
-            query = query & author_query
-        context = super().get_context_data(form=form)
-        print(query)
-        context['articles'] = Article.objects.filter(query).distinct()
-        return self.render_to_response(context=context)
+        article_ids, cached = cached_search(
+            text=form.cleaned_data.get('text'),
+            fields=form.get_index_fields(),
+            author=form.cleaned_data.get('author'),
+            in_articles=form.cleaned_data.get('in_articles'),
+            in_comments=form.cleaned_data.get('in_comments'),
+            order=form.cleaned_data.get('order'),
+        )
+        paginator = Paginator(article_ids, self.paginate_by)
+        page = paginator.get_page(form.data.get('page'))
+        articles = Article.objects.only(*LIST_FIELDS).in_bulk(list(page.object_list))
+        page.object_list = [articles[pk] for pk in page.object_list if pk in articles]
+        context = self.get_context_data(form=form)
+        context['articles'] = page.object_list
+        context['page_obj'] = page
+        context['is_paginated'] = page.has_other_pages()
+        response = self.render_to_response(context=context)
+        response['X-Search-Cache'] = 'hit' if cached else 'miss'
+        return response
@@ -1,4 +1,18 @@
+import hashlib
+import re
+from datetime import datetime, timezone
+
+from django.contrib.messages import get_messages
+from django.http import Http404, HttpResponse
+from django.middleware.csrf import get_token
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, quote_etag
 from django.views.generic import TemplateView
+from webapp.cache import page_cache_generation, get_cached_page, set_cached_page
+from webapp.pagination import KeysetPaginator, InvalidCursor
+
+CSRF_INPUT_RE = re.compile(r'(name="csrfmiddlewaretoken" value=")[^"]*(")')
+CSRF_PLACEHOLDER = '__csrf_token__'
 
 
 class ListView(TemplateView):
@@ -46,3 +60,74 @@ class SearchView(ListView):
 
     def get_filters(self):
         pass
+
+
+class KeysetPaginationMixin:
+    cursor_kwarg = 'cursor'
+    keyset_ordering = ('-created_at', '-id')
+
+    def uses_keyset_pagination(self):
+        return True
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.uses_keyset_pagination():
+            return super().paginate_queryset(queryset, page_size)
+        paginator = KeysetPaginator(queryset, page_size, self.keyset_ordering)
+        try:
+            page = paginator.get_page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404('Неверный курсор страницы')
+        return paginator, page, page.object_list, page.has_other_pages()
+
+
+class PageCacheMixin:
+    """
+    Кеш целых страниц для анонимных GET-запросов и условные ответы 304.
+    Ключи включают поколение кеша, которое сдвигается сигналами при любом изменении
+    статей, тегов или комментариев. CSRF-токен в закешированной странице
+    подставляется заново для каждого посетителя. Пока у посетителя есть
+    непоказанные сообщения, страница рендерится без кеша.
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or len(get_messages(request)):
+            return super().dispatch(request, *args, **kwargs)
+        generation = self.get_page_generation()
+        last_modified = self.get_last_modified(generation)
+        etag = self.get_etag(generation, last_modified)
+        response = get_conditional_response(request, etag=etag, last_modified=int(last_modified.timestamp()))
+        if response is None:
+            response = self.get_page_response(request, generation, *args, **kwargs)
+        if response.status_code in (200, 304):
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified.timestamp())
+        patch_vary_headers(response, ('Cookie',))
+        return response
+
+    def get_page_response(self, request, generation, *args, **kwargs):
+        anonymous = not request.user.is_authenticated
+        page = get_cached_page(request, generation) if anonymous else None
+        if page is not None:
+            content, content_type = page
+            return HttpResponse(content.replace(CSRF_PLACEHOLDER, get_token(request)), content_type=content_type)
+        response = super().dispatch(request, *args, **kwargs)
+        if hasattr(response, 'render'):
+            response.render()
+        if anonymous and response.status_code == 200:
+            content = CSRF_INPUT_RE.sub(r'\g<1>%s\g<2>' % CSRF_PLACEHOLDER, response.content.decode(response.charset))
+            set_cached_page(request, generation, (content, response['Content-Type']))
+        return response
+
+    def get_page_generation(self):
+        return page_cache_generation()
+
+    def get_last_modified(self, generation):
+        return datetime.fromtimestamp(generation, timezone.utc)
+
+    def get_etag_source(self, generation, last_modified):
+        return '%s:%s' % (generation, last_modified.timestamp())
+
+    def get_etag(self, generation, last_modified):
+        user = self.request.user.pk if self.request.user.is_authenticated else 'anonymous'
+        source = '%s:%s' % (self.get_etag_source(generation, last_modified), user)
+        return quote_etag(hashlib.md5(source.encode()).hexdigest())
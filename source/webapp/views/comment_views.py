@@ -1,14 +1,25 @@
+from django.conf import settings
+from django.contrib import messages
 from django.shortcuts import render, get_object_or_404, redirect
+from webapp.comment_queue import comment_queue
+from webapp.db import write_atomic
 from webapp.forms import CommentForm, CommentInArticleForm
 from webapp.models import Article, Comment
 from django.views import View
 from django.views.generic import TemplateView, ListView
+from webapp.views.base_views import KeysetPaginationMixin
 
 
-class CommentView(ListView):
+class CommentView(KeysetPaginationMixin, ListView):
     template_name = 'comment/index.html'
     model = Comment
     context_object_name = 'comments'
+    paginate_by = 10
+
+    def get_queryset(self):
+        return Comment.objects.select_related('article').only(
+            'text', 'author', 'created_at', 'updated_at', 'article', 'article__title'
+        )
 
 
 class CommentCreateView(View):
@@ -19,7 +30,7 @@ class CommentCreateView(View):
     def post(self, request, *args, **kwargs):
         form = CommentForm(data=request.POST)
         if form.is_valid():
-            Comment.objects.create(
+            write_atomic(Comment.objects.create)(
                 author=form.cleaned_data['author'],
                 text=form.cleaned_data['text'],
                 article=form.cleaned_data['article']
@@ -44,7 +55,7 @@ class CommentUpdateView(View):
         comment = get_object_or_404(Comment, pk=kwargs['pk'])
         form = CommentForm(data=request.POST)
         if form.is_valid():
-            Comment.objects.create(
+            write_atomic(Comment.objects.create)(
                 author=form.cleaned_data['author'],
                 text=form.cleaned_data['text'],
                 article=form.cleaned_data['article']
@@ -61,7 +72,7 @@ class CommentDeleteView(View):
 
     def post(self, request, *args, **kwargs):
         comment = get_object_or_404(Comment, pk=kwargs['pk'])
-        comment.delete()
+        write_atomic(comment.delete)()
         return redirect('comment_index')
 
 
@@ -69,13 +80,16 @@ class CommentCreateInArticleView(View):
     def post(self, request, *args, **kwargs):
         article = get_object_or_404(Article, pk = kwargs['article_pk'])
         form = CommentInArticleForm(data=request.POST)
-        print(article)
         if form.is_valid():
-            Comment.objects.create(
+            comment = Comment(
                 author=form.cleaned_data['author'],
                 text=form.cleaned_data['text'],
                 article=article
             )
+            if settings.COMMENT_QUEUE and comment_queue.put(comment):
+                messages.info(request, 'Комментарий принят и появится на странице через несколько секунд.')
+            else:
+                write_atomic(comment.save)()
 
             return redirect('article_view', pk=article.pk)
         else:
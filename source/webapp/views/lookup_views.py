@@ -0,0 +1,35 @@
+from django.http import JsonResponse
+from django.views import View
+from webapp.models import Article, Category
+
+
+class LookupView(View):
+    model = None
+    search_field = None
+    paginate_by = 20
+
+    def get(self, request, *args, **kwargs):
+        term = request.GET.get('q', '').strip()
+        try:
+            page = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            page = 1
+        queryset = self.model.objects.order_by(self.search_field, 'pk')
+        if term:
+            queryset = queryset.filter(**{self.search_field + '__istartswith': term})
+        offset = (page - 1) * self.paginate_by
+        rows = list(queryset.values_list('pk', self.search_field)[offset:offset + self.paginate_by + 1])
+        return JsonResponse({
+            'results': [{'id': pk, 'text': text} for pk, text in rows[:self.paginate_by]],
+            'has_next': len(rows) > self.paginate_by,
+        })
+
+
+class ArticleLookupView(LookupView):
+    model = Article
+    search_field = 'title'
+
+
+class CategoryLookupView(LookupView):
+    model = Category
+    search_field = 'name'
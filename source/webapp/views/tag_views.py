@@ -0,0 +1,15 @@
+from django.views.generic import ListView
+
+from webapp.models import TagStats
+from webapp.pagination import CachedCountPaginator
+from webapp.views.base_views import PageCacheMixin
+
+
+class TagListView(PageCacheMixin, ListView):
+    template_name = 'tag/index.html'
+    context_object_name = 'tags'
+    paginate_by = 50
+    paginator_class = CachedCountPaginator
+
+    def get_queryset(self):
+        return TagStats.objects.filter(articles_count__gt=0).select_related('tag').order_by('-articles_count', 'name')
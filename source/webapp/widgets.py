@@ -0,0 +1,32 @@
+from django.forms import widgets
+from django.urls import reverse
+
+
+class LookupSelect(widgets.Select):
+    """
+    Select, который рендерит только выбранный вариант, а остальные подгружает
+    static/js/lookup.js из JSON-эндпоинта lookup_url по мере ввода.
+    """
+
+    def __init__(self, lookup_url, attrs=None):
+        super().__init__(attrs)
+        self.lookup_url = lookup_url
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['attrs']['data-lookup-url'] = reverse(self.lookup_url)
+        return context
+
+    def use_required_attribute(self, initial):
+        # Select проверяет первый вариант из choices, что запускает запрос по всей таблице.
+        return False
+
+    def optgroups(self, name, value, attrs=None):
+        options = []
+        if not self.is_required:
+            options.append(self.create_option(name, '', '---------', not any(value), 0))
+        selected = [v for v in value if v not in ('', None)]
+        if selected:
+            for obj in self.choices.queryset.filter(pk__in=selected):
+                options.append(self.create_option(name, obj.pk, str(obj), True, len(options)))
+        return [(None, options, 0)]